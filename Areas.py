@@ -0,0 +1,94 @@
+import os, json, hashlib
+import numpy as np
+import pandas as pd
+
+#Columns read from each demographic csv (keyed by its name in config['files']), the first being the area code.
+#Only the columns used by the overall view are read
+LSOA_SOURCES = {
+    'ethnicity': ['LSOA_CODE', 'BAME %'],
+    'age': ['LSOA_CODE', 'Age 0 to 24', 'Age 25 to 49', 'Age 50 to 64', 'Age 65 and over'],
+    'imds': ['lsoa11cd', 'lsoa11nm', 'IMDDec0'],
+}
+AUTHORITY_SOURCES = {
+    'imd_regional': ['Local Authority District code (2019)', 'Income deprivation rate quintile'],
+    'population_regional': ['Area code', '% of all persons 65+'],
+    'ethnicity_regional': ['Area code', 'BAME %'],
+}
+AGE_GROUPS = ['Age 0 to 24', 'Age 25 to 49', 'Age 50 to 64', 'Age 65 and over']
+
+
+#Reads the used columns of a csv, indexed by area code, with codes and names as categories and measures downcast
+def read_area_csv(path, columns):
+    df = pd.read_csv(path, usecols=columns, dtype={columns[0]: 'category'}, engine='pyarrow')
+    for column in df.columns[1:]:
+        if pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = compact(df[column])
+        else:
+            df[column] = df[column].astype('category')
+    return df.set_index(columns[0]).rename_axis('code')
+
+
+#Smallest integer type for whole numbers, float32 otherwise
+def compact(series):
+    if pd.api.types.is_integer_dtype(series) or (series.notna().all() and np.array_equal(series, series.round())):
+        return pd.to_numeric(series.astype('int64'), downcast='integer')
+    return series.astype('float32')
+
+
+def build_lsoa_table(path_to_data, config):
+    ethnicity, age, imd = [read_area_csv(f"{path_to_data}/{config['files'][file]}", columns) for file, columns in LSOA_SOURCES.items()]
+    #Share of the population aged 65 and over, as a percentage
+    population = age[AGE_GROUPS].astype('int64').sum(axis=1)
+    age = (100 * age['Age 65 and over'].astype('float64') / population).round(1).astype('float32').to_frame('Age 65 and over')
+    table = ethnicity.join(age, how='inner').join(imd, how='inner')
+    return table.rename(columns={'IMDDec0': 'Index of multiple deprivation decile'})
+
+
+def build_authority_table(path_to_data, config):
+    imd, population, ethnicity = [read_area_csv(f"{path_to_data}/{config['files'][file]}", columns) for file, columns in AUTHORITY_SOURCES.items()]
+    return imd.join(population, how='inner').join(ethnicity, how='inner')
+
+
+TABLES = {'lsoas': (build_lsoa_table, LSOA_SOURCES), 'local_authorities': (build_authority_table, AUTHORITY_SOURCES)}
+
+
+def table_path(path_to_data, config, table):
+    return f"{path_to_data}/{config['files']['area_tables'][table]}"
+
+
+#Size and mtime of each source csv and a hash of this module, as recorded next to the table built from them
+def source_stats(path_to_data, config, table):
+    with open(__file__, 'rb') as f:
+        stats = {'code': hashlib.blake2b(f.read(), digest_size=8).hexdigest()}
+    for file in TABLES[table][1]:
+        stat = os.stat(f"{path_to_data}/{config['files'][file]}")
+        stats[config['files'][file]] = [stat.st_size, stat.st_mtime_ns]
+    return stats
+
+
+def update_area_tables(path_to_data, config, tables=('lsoas', 'local_authorities')):
+
+    '''
+    Joins the demographic csvs for each area type into one table, saved as parquet, when any of its csvs (or this module) has changed.\n
+    Each table is indexed by area code and only holds the columns used by the views, with names as categories and
+    measures as the smallest numeric type that fits.
+    '''
+
+    for table in tables:
+        path = table_path(path_to_data, config, table)
+        stats = source_stats(path_to_data, config, table)
+        sidecar = path.replace('.parquet', '.sources.json')
+        if os.path.exists(path) and os.path.exists(sidecar):
+            with open(sidecar, 'r') as f:
+                if json.load(f) == stats:
+                    print(f'{path} is up-to-date')
+                    continue
+        TABLES[table][0](path_to_data, config).to_parquet(path)
+        #Written last, so an interrupted build is redone on the next run
+        with open(sidecar, 'w') as f:
+            json.dump(stats, f, indent=2)
+        print(f'{path} was updated')
+
+
+def load_area_table(path_to_data, config, table):
+    return pd.read_parquet(table_path(path_to_data, config, table))
@@ -0,0 +1,114 @@
+import os, glob, json, pickle, hashlib, platform
+from importlib import metadata
+
+#Libraries whose version changes what the views contain
+LIBRARIES = ('pandas', 'numpy', 'plotly', 'geopandas', 'shapely')
+
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+#Version of the code building the site: every module next to this one plus the library versions
+def code_version():
+    sources = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py')))
+    hasher = hashlib.blake2b(digest_size=16)
+    for source in sources:
+        with open(source, 'rb') as file:
+            hasher.update(os.path.basename(source).encode() + file.read())
+    versions = {'python': platform.python_version()}
+    for library in LIBRARIES:
+        try:
+            versions[library] = metadata.version(library)
+        except metadata.PackageNotFoundError:
+            versions[library] = None
+    hasher.update(json.dumps(versions, sort_keys=True).encode())
+    return hasher.hexdigest()
+
+
+#Size and modification time of each file a stage reads, None for missing files
+def file_stats(paths):
+    stats = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stats[path] = [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            stats[path] = None
+    return stats
+
+
+class Cached(object):
+
+    '''
+    A stage output kept in the build cache, only read from disk when a stage that runs needs it.
+    '''
+
+    def __init__(self, path, output):
+        self.path = path
+        self.output = output
+
+
+class BuildCache(object):
+
+    '''
+    Content-addressed store of stage outputs.\n
+    A stage's fingerprint covers its function, the code version, its keyword arguments (with config narrowed to
+    the stage's config_keys), the fingerprints of its inputs and the size and mtime of the files it reads. A stage
+    whose fingerprint has a stored entry isn't run, its outputs are read from the entry if a later stage needs them.\n
+    cache_dir - Folder holding one pickle per stage (older entries of a stage are removed when it's rebuilt).
+    '''
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.version = code_version()
+        self.loaded = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def fingerprint(self, stage, fingerprints):
+        kwargs = dict(stage.kwargs)
+        if 'config' in kwargs and stage.config_keys:
+            kwargs['config'] = {key: kwargs['config'].get(key) for key in stage.config_keys}
+        func = stage.func if isinstance(stage.func, str) else f'{stage.func.__module__}:{stage.func.__qualname__}'
+        reads = stage.reads() if callable(stage.reads) else stage.reads
+        return digest(json.dumps({'stage': stage.name, 'func': func, 'version': self.version, 'kwargs': kwargs,
+                                  'inputs': {name: fingerprints[name] for name in stage.inputs},
+                                  'reads': file_stats(reads)}, sort_keys=True, default=str).encode())
+
+    def path(self, stage, fingerprint):
+        return f'{self.cache_dir}/{stage.name}-{fingerprint}.pickle'
+
+    #Placeholders for a stage's outputs if its entry exists and is still valid, otherwise None
+    def lookup(self, stage, fingerprint):
+        path = self.path(stage, fingerprint)
+        if not os.path.exists(path) or (stage.valid is not None and not stage.valid()):
+            return None
+        return [Cached(path, output) for output in stage.outputs]
+
+    def resolve(self, value):
+        if not isinstance(value, Cached):
+            return value
+        if value.path not in self.loaded:
+            with open(value.path, 'rb') as file:
+                self.loaded[value.path] = pickle.load(file)
+        return self.loaded[value.path][value.output]
+
+    def store(self, stage, fingerprint, values):
+        path = self.path(stage, fingerprint)
+        with open(f'{path}.tmp', 'wb') as file:
+            pickle.dump({output: values[output] for output in stage.outputs}, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{path}.tmp', path)
+        #Kept in memory too, so a long-running process (Pipeline.watch) doesn't read it back
+        self.loaded[path] = {output: values[output] for output in stage.outputs}
+        for old in glob.glob(f'{self.cache_dir}/{glob.escape(stage.name)}-*.pickle'):
+            if old != path:
+                os.remove(old)
+                self.loaded.pop(old, None)
+
+
+#Fingerprint of a value produced by a stage that isn't cached
+def value_fingerprint(value):
+    try:
+        return digest(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return digest(repr(value).encode() + str(id(value)).encode())
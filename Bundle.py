@@ -0,0 +1,297 @@
+import os, re, glob, json, gzip, base64, hashlib, threading
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+import plotly.io as pio
+from plotly.offline import get_plotlyjs
+
+#Brotli is optional, without it only .gz files are written
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=6).hexdigest()
+
+
+def hashed_name(filename, data):
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}.{content_hash(data)}{ext}'
+
+
+#Name of the shared plotly.js asset, which changes whenever the plotly.js bundle does
+@lru_cache(maxsize=None)
+def plotly_asset():
+    return hashed_name('plotly.min.js', get_plotlyjs().encode())
+
+
+#What write_view and write_fragment write in the current thread, recorded while a stage is being profiled
+written = threading.local()
+
+
+def log_written(**entry):
+    entries = getattr(written, 'entries', None)
+    if entries is not None:
+        entries.append(entry)
+
+
+#Numeric arrays that are sent as plotly.js typed arrays, including z arrays swapped in by restyle buttons
+TYPED_ARRAY_KEYS = ('x', 'y', 'z', 'lat', 'lon', 'color')
+
+
+#Encodes a numeric array in plotly's base64 typed array format, using the smallest integer type that fits
+def encode_array(values):
+    values = np.asarray(values)
+    if values.ndim != 1 or not len(values) or values.dtype.kind not in 'biuf':
+        return None
+    if values.dtype.kind == 'f':
+        dtype = 'f4'
+    else:
+        low, high = int(values.min()), int(values.max())
+        dtype = next((dtype for dtype in ('u1', 'i1', 'u2', 'i2', 'u4', 'i4')
+                      if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max), 'f8')
+    return {'dtype': dtype, 'bdata': base64.b64encode(values.astype(f'<{dtype}').tobytes()).decode('ascii')}
+
+
+def is_array(value):
+    return isinstance(value, (np.ndarray, pd.Series, pd.Index))
+
+
+def typed_arrays(obj):
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if key in TYPED_ARRAY_KEYS and is_array(value):
+                obj[key] = encode_array(value) or value
+            #Restyle arguments hold one array per trace
+            elif key in TYPED_ARRAY_KEYS and isinstance(value, list) and any(is_array(item) for item in value):
+                obj[key] = [(encode_array(item) or item) if is_array(item) else item for item in value]
+            else:
+                typed_arrays(value)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            typed_arrays(item)
+    return obj
+
+
+#Writes a view referencing the shared plotly.js asset rather than embedding its own copy, fig can be a figure or its dict
+def write_view(fig, outdir, filename, **kwargs):
+    fig = typed_arrays(fig if isinstance(fig, dict) else fig.to_dict())
+    if getattr(written, 'entries', None) is not None:
+        for idx, trace in enumerate(fig['data']):
+            log_written(file=filename, trace=idx, type=trace.get('type'), name=trace.get('name'),
+                        bytes=len(pio.json.to_json_plotly(trace)))
+    pio.write_html(fig, file=f'{outdir}/{filename}', include_plotlyjs=plotly_asset(),
+                   auto_open=False, validate=False, **kwargs)
+
+
+#Writes a view's data fragment under a content-hashed name, so it can be cached indefinitely, and returns that name
+def write_fragment(directory, name, obj):
+    data = pio.json.to_json_plotly(typed_arrays(obj)).encode()
+    filename = hashed_name(f'{name}.json', data)
+    log_written(file=filename, trace=obj.get('trace') if isinstance(obj, dict) else None, type='fragment', name=name, bytes=len(data))
+    if not os.path.exists(f'{directory}/{filename}'):
+        with open(f'{directory}/{filename}', 'wb') as file:
+            file.write(data)
+    precompress(f'{directory}/{filename}')
+    return filename
+
+
+#Removes fragments (and their compressed copies) that are no longer referenced, leaving subfolders alone
+def remove_unlisted(directory, filenames):
+    for filename in os.listdir(directory):
+        if re.sub(r'\.(gz|br)$', '', filename) not in filenames and os.path.isfile(f'{directory}/{filename}'):
+            os.remove(f'{directory}/{filename}')
+
+
+#Fetches the fragment named by a dropdown button the first time it's selected, then applies it from the browser's cache.
+#A trace's geometry, locations and customdata are only restyled onto it the first time one of its layers is shown.
+#Traces whose geometry is tiled only get the features of the tiles in view, refetched (from cache) as the map moves
+LAZY_LAYERS_SCRIPT = """
+var gd = document.getElementById('{plot_id}');
+var fragments = {};
+function fetchJSON(path) {
+    if (!(path in fragments)) {
+        fragments[path] = fetch(path).then(function(response) { return response.json(); });
+    }
+    return fragments[path];
+}
+function fetchFragment(name) {
+    return fetchJSON('{directory}/' + name);
+}
+var geometries = {};
+var tiled = {};
+function tileColumn(lon, n) {
+    return Math.min(n - 1, Math.max(0, Math.floor((lon + 180) / 360 * n)));
+}
+function tileRow(lat, n) {
+    lat = Math.max(-85.0511, Math.min(85.0511, lat)) * Math.PI / 180;
+    return Math.min(n - 1, Math.max(0, Math.floor((1 - Math.asinh(Math.tan(lat)) / Math.PI) / 2 * n)));
+}
+//Shows the tiles in view at the most detailed zoom of the trace's pyramid that isn't above the map's zoom
+function loadTiles(trace) {
+    var tiles = tiled[trace];
+    if (!tiles || gd.data[trace].visible !== true) { return; }
+    var map = gd._fullLayout.mapbox._subplot.map;
+    var zooms = Object.keys(tiles.index.zooms).map(Number).sort(function(a, b) { return a - b; });
+    var zoom = zooms.filter(function(z) { return z <= map.getZoom(); }).pop();
+    if (zoom === undefined) { zoom = zooms[0]; }
+    var bounds = map.getBounds(), n = Math.pow(2, zoom), names = [];
+    for (var x = tileColumn(bounds.getWest(), n); x <= tileColumn(bounds.getEast(), n); x++) {
+        for (var y = tileRow(bounds.getNorth(), n); y <= tileRow(bounds.getSouth(), n); y++) {
+            var name = tiles.index.zooms[zoom][x + '/' + y];
+            if (name) { names.push(name); }
+        }
+    }
+    var shown = zoom + ':' + names.join(',');
+    if (shown === tiles.shown) { return; }
+    tiles.shown = shown;
+    Promise.all(names.map(function(name) { return fetchJSON(tiles.index.directory + '/' + name); })).then(function(collections) {
+        if (tiles.shown !== shown || tiled[trace] !== tiles) { return; }
+        //Features spanning several tiles are in each of them
+        var features = [], seen = {};
+        collections.forEach(function(collection) {
+            collection.features.forEach(function(feature) {
+                if (!(feature.id in seen)) { seen[feature.id] = true; features.push(feature); }
+            });
+        });
+        Plotly.restyle(gd, {geojson: [{type: 'FeatureCollection', features: features}]}, [trace]);
+    });
+}
+gd.on('plotly_buttonclicked', function(event) {
+    var name = gd.layout.updatemenus[event.menu._index].buttons[event.button._index].name;
+    if (!name) { return; }
+    fetchFragment(name).then(function(layer) {
+        return fetchFragment(layer.geometry).then(function(geometry) {
+            return (geometry.tiles ? fetchJSON('{tiles_directory}/' + geometry.tiles) : Promise.resolve(null)).then(function(index) {
+                var restyle = Object.assign({}, layer.restyle);
+                if (geometries[layer.trace] !== layer.geometry) {
+                    geometries[layer.trace] = layer.geometry;
+                    if (index) {
+                        tiled[layer.trace] = {index: index};
+                        geometry = Object.assign({geojson: {type: 'FeatureCollection', features: []}}, geometry);
+                    } else {
+                        delete tiled[layer.trace];
+                    }
+                    ['geojson', 'locations', 'customdata'].forEach(function(attribute) {
+                        restyle[attribute] = gd.data.map(function(trace, idx) { return idx === layer.trace ? geometry[attribute] : undefined; });
+                    });
+                }
+                return Plotly.update(gd, restyle, layer.relayout).then(function() { loadTiles(layer.trace); });
+            });
+        });
+    });
+});
+gd.on('plotly_relayout', function() {
+    Object.keys(tiled).forEach(function(trace) { loadTiles(Number(trace)); });
+});
+"""
+
+
+def lazy_layers_script(directory, tiles_directory=''):
+    return LAZY_LAYERS_SCRIPT.replace('{directory}', directory).replace('{tiles_directory}', tiles_directory)
+
+
+#Writes .gz (and .br if brotli is installed) copies next to a file, unless they're already up-to-date
+def precompress(path, level=9):
+    with open(path, 'rb') as file:
+        data = file.read()
+    compressors = {'gz': lambda data: gzip.compress(data, compresslevel=level, mtime=0)}
+    if brotli is not None:
+        compressors['br'] = lambda data: brotli.compress(data, quality=min(level + 2, 11))
+    for ext, compressor in compressors.items():
+        if os.path.exists(f'{path}.{ext}') and os.path.getmtime(f'{path}.{ext}') >= os.path.getmtime(path):
+            continue
+        with open(f'{path}.{ext}', 'wb') as file:
+            file.write(compressor(data))
+
+
+#Files of the built site that are worth compressing
+COMPRESSIBLE = ('.html', '.js', '.css', '.json', '.svg', '.xml', '.txt', '.map')
+
+
+def precompress_site(site_dir, level=9):
+
+    '''
+    Writes .gz (and .br) copies of every text file of a site built by mkdocs that doesn't have them yet.\n
+    The views, plotly.js and the overview fragments are copied from the docs folder with their compressed copies, so
+    only the pages mkdocs generated (and its theme assets) are compressed. The site folder is rebuilt from scratch each time.
+    '''
+
+    extensions = ['gz'] + (['br'] if brotli is not None else [])
+    for root, _, filenames in os.walk(site_dir):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            if filename.endswith(COMPRESSIBLE) and not all(os.path.exists(f'{path}.{ext}') for ext in extensions):
+                precompress(path, level)
+
+
+#Removes older hashed copies of a file along with their compressed versions
+def remove_stale(outdir, filename, current):
+    stem, ext = os.path.splitext(filename)
+    for path in glob.glob(f'{outdir}/{glob.escape(stem)}.*{ext}*'):
+        if not os.path.basename(path).startswith(current) and re.fullmatch(rf'{re.escape(stem)}\.[0-9a-f]{{12}}{re.escape(ext)}(\.gz|\.br)?', os.path.basename(path)):
+            os.remove(path)
+
+
+#Whether the packaged copy of a view (and any folders it fetches from) from an earlier run is still in place
+def view_published(outdir, view, *directories):
+    try:
+        with open(f'{outdir}/assets.json', 'r') as file:
+            hashed = json.load(file)[view]
+    except (FileNotFoundError, KeyError, ValueError):
+        return False
+    return os.path.exists(f'{outdir}/{hashed}') and all(os.path.isdir(f'{outdir}/{directory}') for directory in directories)
+
+
+def package_site(outdir, config, views):
+
+    '''
+    Packages the generated views for the site.\n
+    Writes one shared, content-hashed plotly.js asset, renames each view to a content-hashed name, points the
+    markdown pages in outdir at the hashed names and writes precompressed copies of every HTML and JS file.\n
+    views - Filenames of the generated views, views packaged by earlier runs stay listed.\n
+    Returns a dict of view filename -> hashed filename, also written to assets.json in outdir.
+    '''
+
+    level = config.get('bundle', {}).get('compression_level', 9)
+    #Views that weren't built in this run (or weren't regenerated) keep their current hashed file
+    assets = {}
+    if os.path.exists(f'{outdir}/assets.json'):
+        with open(f'{outdir}/assets.json', 'r') as file:
+            assets = json.load(file)
+
+    asset = plotly_asset()
+    if not os.path.exists(f'{outdir}/{asset}'):
+        with open(f'{outdir}/{asset}', 'w', encoding='utf-8') as file:
+            file.write(get_plotlyjs())
+    remove_stale(outdir, 'plotly.min.js', asset)
+    precompress(f'{outdir}/{asset}', level)
+    assets['plotly.min.js'] = asset
+
+    for view in views:
+        if not os.path.exists(f'{outdir}/{view}'):
+            continue
+        with open(f'{outdir}/{view}', 'rb') as file:
+            hashed = hashed_name(view, file.read())
+        os.replace(f'{outdir}/{view}', f'{outdir}/{hashed}')
+        remove_stale(outdir, view, hashed)
+        precompress(f'{outdir}/{hashed}', level)
+        assets[view] = hashed
+
+    #Pointing the markdown pages at the hashed views
+    for page in glob.glob(f'{outdir}/*.md'):
+        with open(page, 'r', encoding='utf-8') as file:
+            text = updated = file.read()
+        for view, hashed in assets.items():
+            stem, ext = os.path.splitext(view)
+            updated = re.sub(rf'(?<![\w.-]){re.escape(stem)}(\.[0-9a-f]{{12}})?{re.escape(ext)}', hashed, updated)
+        if updated != text:
+            with open(page, 'w', encoding='utf-8') as file:
+                file.write(updated)
+
+    with open(f'{outdir}/assets.json', 'w') as file:
+        json.dump(assets, file, indent=2)
+    print('Site assets were packaged')
+    return assets
@@ -0,0 +1,119 @@
+import os, re, json
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import plotly.io as pio
+from BuildCache import digest
+from Bundle import is_array
+
+#Dropdowns of each view, in the order of its updatemenus, naming the folder its snapshots are written to
+MENUS = {'organisation_view': ['organisations'], 'project_view': ['projects', 'portfolios']}
+
+
+#A name that's safe as a filename on every platform
+def safe_name(label):
+    return re.sub(r'[^\w\- .]+', '_', str(label)).strip(' .') or '_'
+
+
+#Filename of each label of a dropdown. Labels whose safe names clash (e.g. A/B and A:B) get a short hash of the label,
+#apart from a label that's already safe as it is, so each entry keeps its own file whatever order the labels come in
+def file_names(labels):
+    names = {label: safe_name(label) for label in labels}
+    counts = Counter(names.values())
+    return {label: name if counts[name] == 1 or name == str(label) else f'{name}-{digest(str(label).encode())[:8]}'
+            for label, name in names.items()}
+
+
+def snapshots(fig, menus):
+
+    '''
+    The figure as it looks after choosing each dropdown entry, without the dropdowns.\n
+    The entry's update is applied to the figure dict and the traces it hides are left out, so each snapshot only holds
+    the data it shows (and its hash only changes when that data does). 'Select...' entries are skipped.\n
+    Yields (menu name, entry label, figure dict).
+    '''
+
+    for menu, updatemenu in zip(menus, fig['layout']['updatemenus']):
+        for button in updatemenu['buttons']:
+            restyle, relayout = button['args']
+            if not is_array(restyle.get('visible')):
+                continue
+            layout = dict(fig['layout'], **relayout)
+            layout.pop('updatemenus')
+            #A title given as text keeps the position of the view's title, as it does in the browser
+            if isinstance(relayout.get('title'), str):
+                layout['title'] = dict(fig['layout'].get('title', {}), text=relayout['title'])
+            data = [dict(trace, visible=True) for trace, visible in zip(fig['data'], restyle['visible']) if visible]
+            yield menu, button['label'], {'data': data, 'layout': layout}
+
+
+#Each renderer process keeps one kaleido (chromium) subprocess running, started before its first figure
+def start_renderer():
+    pio.to_image({'data': [], 'layout': {}}, format='png', width=10, height=10)
+
+
+#Returns whether the image has its basemap, maps whose tiles can't be fetched are rendered on a blank background instead
+def render(spec, path, format, width, height, scale):
+    fig, complete = json.loads(spec), True
+    try:
+        image = pio.to_image(fig, format=format, width=width, height=height, scale=scale, validate=False)
+    except ValueError as error:
+        if 'mapbox' not in fig['layout'] or 'Mapbox error' not in str(error):
+            raise
+        fig['layout']['mapbox']['style'], complete = 'white-bg', False
+        image = pio.to_image(fig, format=format, width=width, height=height, scale=scale, validate=False)
+    with open(f'{path}.tmp', 'wb') as file:
+        file.write(image)
+    os.replace(f'{path}.tmp', path)
+    return path, complete
+
+
+def export_figures(figures, config, directory, workers=1):
+
+    '''
+    Writes a static image of every dropdown entry of the given views, e.g. exports/projects/<project>.png.\n
+    figures - Dict of view name (organisation_view or project_view) -> figure dict from Views.\n
+    config - The formats, size and scale are read from config['export'].\n
+    The images are rendered by kaleido across a pool of worker processes, each reusing its own renderer. Each image's hash
+    (of the snapshot, format and size) is kept in exports.json in directory, so unchanged images aren't rendered again, and
+    images of entries that no longer exist are removed.\n
+    Returns the number of images rendered.
+    '''
+
+    export_config = config['export']
+    size = dict(width=export_config['width'], height=export_config['height'], scale=export_config['scale'])
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = f'{directory}/exports.json'
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as file:
+            manifest = json.load(file)
+
+    current, pending = {}, []
+    for view, fig in figures.items():
+        entries = list(snapshots(fig, MENUS[view]))
+        names = {menu: file_names([label for entry_menu, label, _ in entries if entry_menu == menu]) for menu in MENUS[view]}
+        for menu, label, snapshot in entries:
+            os.makedirs(f'{directory}/{menu}', exist_ok=True)
+            spec = pio.to_json(snapshot, validate=False)
+            for format in export_config['formats']:
+                path = f'{menu}/{names[menu][label]}.{format}'
+                current[path] = digest(json.dumps([spec, format, size]).encode())
+                if manifest.get(path) != current[path] or not os.path.exists(f'{directory}/{path}'):
+                    pending.append((spec, f'{directory}/{path}', format))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), initializer=start_renderer) as pool:
+            for path, complete in pool.map(render, *zip(*pending), *[[value] * len(pending) for value in size.values()]):
+                path = os.path.relpath(path, directory)
+                print(f'{path} was exported' if complete else f'{path} was exported without its basemap, the map tiles could not be fetched')
+                #Left out of the manifest so the next export tries again
+                if not complete:
+                    current[path] = None
+
+    for path in set(manifest) - set(current):
+        if os.path.exists(f'{directory}/{path}'):
+            os.remove(f'{directory}/{path}')
+    with open(manifest_path, 'w') as file:
+        json.dump(current, file, indent=2, sort_keys=True)
+    print(f'{len(pending)} images were exported, {len(current) - len(pending)} were unchanged')
+    return len(pending)
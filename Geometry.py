@@ -0,0 +1,151 @@
+import os, json, functools, operator, geopandas, shapely
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+#Features per row group of the cached files. The features are sorted along a Hilbert curve before writing, so each row
+#group covers a small area and loading a region skips the row groups whose bounding box statistics lie outside it
+ROW_GROUP_SIZE = 1024
+
+
+#Simplifies a layer as one coverage, so borders shared by neighbouring areas are simplified identically and stay gap-free
+def simplify_layer(df, tolerance=0, precision=None):
+    geometries = np.asarray(df.geometry.array)
+    if tolerance:
+        geometries = shapely.coverage_simplify(geometries, tolerance)
+    #Pointwise rounding moves a shared vertex to the same grid point in every polygon it belongs to
+    if precision:
+        geometries = shapely.set_precision(geometries, precision, mode='pointwise')
+    return df.set_geometry(geopandas.GeoSeries(geometries, index=df.index, crs=df.crs))
+
+
+def level_path(path_to_data, config, file, level):
+    stem = config['files']['geometry_files'][file].replace('.parquet', '')
+    return f"{path_to_data}/{stem}_{level}.parquet"
+
+
+def levels_path(path_to_data, config, file):
+    stem = config['files']['geometry_files'][file].replace('.parquet', '')
+    return f"{path_to_data}/{stem}.levels.json"
+
+
+#Compatibility reader for .feather files written by geofeather or older versions of Mapping.py (wkb column + optional .crs file)
+def read_legacy_feather(path):
+    df = pd.read_feather(path)
+    crs = 'EPSG:4326'
+    if os.path.exists(f'{path}.crs'):
+        with open(f'{path}.crs', 'r') as f:
+            crs = f.read().strip() or crs
+    geometry = geopandas.GeoSeries.from_wkb(df['wkb'], index=df.index, crs=crs)
+    return geopandas.GeoDataFrame(df.drop(columns=['wkb']), geometry=geometry)
+
+
+#Reads a source shapefile, falling back to a legacy .feather copy when the .geojson isn't available
+def read_source(path_to_data, config, file):
+    geojson = f"{path_to_data}/{config['files']['geojson_files'][file]}"
+    if os.path.exists(geojson) or not os.path.exists(f"{path_to_data}/{config['files']['feather_files'][file]}"):
+        return geopandas.read_file(geojson)
+    return read_legacy_feather(f"{path_to_data}/{config['files']['feather_files'][file]}")
+
+
+def source_path(path_to_data, config, file):
+    geojson = f"{path_to_data}/{config['files']['geojson_files'][file]}"
+    if os.path.exists(geojson):
+        return geojson
+    return f"{path_to_data}/{config['files']['feather_files'][file]}"
+
+
+#Settings the cached files were written with, kept next to them
+def cache_settings(config):
+    return {'levels': config['geometry']['levels'], 'row_group_size': ROW_GROUP_SIZE}
+
+
+#Checks whether the .geojson shapefile or the configured levels have changed since the cache was built
+def check_shapefile_modification(path_to_data, config, file):
+    levels = config['geometry']['levels']
+    sidecar = levels_path(path_to_data, config, file)
+    if not os.path.exists(sidecar):
+        return True
+    if os.path.getmtime(source_path(path_to_data, config, file)) > os.path.getmtime(sidecar):
+        return True
+    with open(sidecar, 'r') as f:
+        if json.load(f) != cache_settings(config):
+            return True
+    return not all(os.path.exists(level_path(path_to_data, config, file, level)) for level in levels)
+
+
+def update_geometry_cache(path_to_data, config, files=('lsoas', 'stps', 'local_authorities')):
+
+    '''
+    Converts updated .geojson files to a cached GeoParquet file for each configured level of detail.\n
+    Each level in config['geometry']['levels'] has a simplification tolerance and a coordinate precision (grid size), both in degrees.\n
+    Geometries are WKB encoded in one vectorised pass, and the CRS and bounding boxes are kept in the GeoParquet metadata.
+    Features are written in Hilbert curve order in row groups of ROW_GROUP_SIZE, keeping their original index.
+    '''
+
+    levels = config['geometry']['levels']
+    for file in files:
+        if not check_shapefile_modification(path_to_data, config, file):
+            print(f'{source_path(path_to_data, config, file)} is up-to-date')
+            continue
+        df = read_source(path_to_data, config, file)
+        df = df.iloc[np.argsort(df.hilbert_distance().to_numpy(), kind='stable')] if len(df) else df
+        for level, settings in levels.items():
+            simplified = simplify_layer(df, settings.get('tolerance', 0), settings.get('precision'))
+            #Uncompressed, so the cached layers can be memory-mapped on load
+            simplified.to_parquet(level_path(path_to_data, config, file, level), compression=None, write_covering_bbox=True,
+                                  row_group_size=ROW_GROUP_SIZE)
+        #Written last, so an interrupted conversion is redone on the next run
+        with open(levels_path(path_to_data, config, file), 'w') as f:
+            json.dump(cache_settings(config), f, indent=2)
+        print(f'{source_path(path_to_data, config, file)} was updated')
+
+
+#The filters given to load_geometry and those set for the file under geometry: region: filters in the config, as one pyarrow expression
+def region_filter(config, file, filters=None):
+    configured = config['geometry'].get('region', {}).get('filters', {}).get(file)
+    expressions = [pq.filters_to_expression(filter) for filter in (configured, filters) if filter]
+    return functools.reduce(operator.and_, expressions) if expressions else None
+
+
+#Rows of a frame matching the bbox and filters of load_geometry, for files without row group statistics
+def filter_frame(df, bbox=None, filters=None):
+    if bbox is not None:
+        df = df[shapely.intersects(shapely.box(*bbox), shapely.envelope(np.asarray(df.geometry.array)))]
+    if filters is not None:
+        table = pa.Table.from_pandas(pd.DataFrame(df.drop(columns=df.geometry.name)).assign(_row=np.arange(len(df))), preserve_index=False)
+        df = df.iloc[table.filter(filters)['_row'].to_numpy()]
+    return df
+
+
+def load_geometry(path_to_data, config, file, level=None, columns=None, bbox=None, filters=None):
+
+    '''
+    Loads a cached shapefile at the level of detail chosen in the config (or level), in the order of the source file.\n
+    bbox - [min lon, min lat, max lon, max lat], only features whose bounding box intersects it are read.\n
+    filters - pyarrow filters on attribute columns (e.g. [('STP21NM', 'in', names)]), only matching features are read.
+    Any filters set for the file in the config's region are applied as well.\n
+    Both are pushed down to the parquet reader, so row groups outside the region are never read or decoded.
+    '''
+
+    path = level_path(path_to_data, config, file, level or config['geometry']['level'])
+    filters = region_filter(config, file, filters)
+    if not os.path.exists(path) and os.path.exists(path.replace('.parquet', '.feather')):
+        return filter_frame(read_legacy_feather(path.replace('.parquet', '.feather')), bbox, filters)
+    df = geopandas.read_parquet(path, columns=columns, memory_map=True, bbox=None if bbox is None else tuple(bbox), filters=filters)
+    return df.sort_index()
+
+
+#Loads only the STPs of the ICSs listed in ics_locations.csv, matched on their name in the shapefile
+def load_ics_shapes(path_to_data, config, ics_locations):
+    from Prepare import ICS_NAMES
+    names = set(ics_locations['Name'])
+    names.update(name for name, ics in ICS_NAMES.items() if ics in names)
+    return load_geometry(path_to_data, config, 'stps', filters=[('STP21NM', 'in', sorted(names))])
+
+
+#Bounding box of the area the views cover: the box in the config, or the box around the ICSs that were loaded
+def region_bounds(stps_shapes, config):
+    bbox = config['geometry'].get('region', {}).get('bbox')
+    return list(bbox) if bbox else [float(bound) for bound in stps_shapes.total_bounds]
@@ -1,627 +1,418 @@
-import fire, os, yaml, geopandas, subprocess, warnings
-import pandas as pd
-import plotly.graph_objects as go
-import plotly.express as px
-import plotly.io as pio
-import numpy as np
-import geofeather as gf
-
-#Ignoring warning outputs
-pd.options.mode.chained_assignment = None  # default='warn'
-warnings.filterwarnings('ignore', message='.*crs will be set for this GeoDataFrame.*')
-
-#Defines the command needed to run this code, an example command could be: python mapping.py generate mkdocs/docs
-def generate(outdir='mkdocs/docs', output_mode='external', path_to_data='data', path_to_config='config_mkdocs.yml', path_to_site='mkdocs'):
-    
+import fire, os, sys, yaml, time, inspect, subprocess
+from functools import partial
+from Stages import Stage, run_pipeline, select_stages
+from Profiling import write_report, print_summary
+from Watch import watched_files, snapshot, wait_for_changes
+from BuildCache import BuildCache
+
+#Stage functions are named as 'Module:function' so pandas, plotly and geopandas are only imported by the stages that use them,
+#e.g. building the organisation view never imports geopandas
+VIEWS={'organisations':'organisation_view','projects':'project_view','overall':'overall_view'}
+#Stages that convert the input files into the cached copies the views are built from
+INGEST=['combined_report','geometry_cache','area_tables']
+
+
+def geometry_files(path_to_data, config, file):
+    from Geometry import level_path
+    return [level_path(path_to_data, config, file, config['geometry']['level']), f"{path_to_data}/{config['files']['feather_files'][file]}"]
+
+
+def area_table_files(path_to_data, config, table):
+    from Areas import table_path
+    return [table_path(path_to_data, config, table)]
+
+
+#Geometry levels the tile pyramid is cut from
+def tile_files(path_to_data, config):
+    from Geometry import level_path
+    from Tiles import TILE_IDS
+    return [level_path(path_to_data, config, file, level) for file in TILE_IDS for level in config['geometry']['tiles']['zooms'].values()]
+
+
+def tiles_published(outdirs, config):
+    from Tiles import tiles_published
+    return tiles_published(outdirs, config)
+
+
+def view_published(outdir, view, *directories):
+    from Bundle import view_published
+    return view_published(outdir, view, *directories)
+
+
+#Folder the views are written to when neither --outdir nor the variant's config gives one
+DOCS_OUTDIR='mkdocs/docs'
+
+
+def variant_outdirs(config, output_mode, outdir=None):
+
+    '''
+    Folder each of the given output variants is written to.\n
+    outdir - Folder given on the command line, used for the variant whatever its outdir in the config. It can only be
+    given for a single variant, as variants written to the same folder would overwrite each other's views.\n
+    Without outdir each variant goes to its outdir in the config, or to mkdocs/docs if it has none.
+    '''
+
+    variants=config['output_variants']
+    modes=[output_mode] if isinstance(output_mode, str) else list(output_mode)
+    unknown=[mode for mode in modes if mode not in variants]
+    if unknown:
+        raise ValueError(f"Unknown output_mode {unknown}, the config defines {list(variants)}")
+    if outdir is not None:
+        if len(modes)>1:
+            raise ValueError(f"--outdir can only be given for one output variant, leave it out to write {modes} to their outdirs in the config")
+        return {modes[0]: outdir}
+    return {mode: variants[mode].get('outdir') or DOCS_OUTDIR for mode in modes}
+
+
+#Folder mkdocs builds the site from, docs_dir in mkdocs.yml
+def docs_dir(path_to_site):
+    config={}
+    if os.path.exists(f'{path_to_site}/mkdocs.yml'):
+        with open(f'{path_to_site}/mkdocs.yml', 'r') as file:
+            config=yaml.safe_load(file) or {}
+    return os.path.join(path_to_site, config.get('docs_dir', 'docs'))
+
+
+#Variants written outside the docs folder of the site, which mkdocs doesn't build or serve
+def unpublished_variants(outdirs, path_to_site):
+    docs=os.path.realpath(docs_dir(path_to_site))
+    return {variant: directory for variant, directory in outdirs.items()
+            if os.path.commonpath([docs, os.path.realpath(directory)])!=docs}
+
+
+def warn_unpublished(outdirs, path_to_site):
+    for variant, directory in unpublished_variants(outdirs, path_to_site).items():
+        print(f'Warning: the {variant} views are written to {directory}, outside {docs_dir(path_to_site)}, so the site being served doesn\'t show them')
+
+
+def variant_stages(config, variant, outdir, views):
+
+    '''
+    The stages building one output variant, named and producing values suffixed with @variant (e.g. overall_view@internal).\n
+    They start from the shared prepared report, so the files, geometry and demographics are loaded and joined once for all variants.
+    '''
+
+    settings=config['output_variants'][variant]
+    def named(*names):
+        return {name: f'{name}@{variant}' for name in names}
+    def view_stage(name, func, inputs, *directories):
+        return Stage(f'{name}@{variant}', func, inputs=inputs, outputs=f'{name}@{variant}', cpu_bound=True, config_keys=[name],
+                     valid=partial(view_published, outdir, config[name]['filename'], *directories), config=config, outdir=outdir)
+    return [
+        #Rows and columns this variant's audience may see
+        Stage(f'apply_variant@{variant}', 'Prepare:apply_variant', inputs=['implementation_report','organisation_counts'],
+              outputs=list(named('implementation_report','organisation_counts').values()),
+              exclude=settings.get('exclude') or {}, redact=settings.get('redact') or {}),
+        Stage(f'prepare_projects@{variant}', 'Prepare:prepare_projects', inputs=named('implementation_report','organisation_counts'),
+              outputs=list(named('organisations','project_names','membership').values())),
+        Stage(f'prepare_stps@{variant}', 'Prepare:prepare_stps', inputs=dict(stps_shapes='stps_shapes', ics_locations='ics_locations', **named('organisations')),
+              outputs=list(named('stps','stps_pd').values())),
+        Stage(f'aggregate_projects@{variant}', 'Spatial:aggregate_projects',
+              inputs=dict(area_index='area_index', **named('organisations','implementation_report')), outputs=f'area_projects@{variant}'),
+        #Views, independent of each other once the shared frames exist. Each is only rebuilt when its inputs, its section of
+        #the config or the code change, and while its packaged copy is still in outdir
+        view_stage('organisation_view', 'Views:generate_organisation_view', named('implementation_report')),
+        view_stage('project_view', 'Views:generate_project_view', named('project_names','membership','implementation_report')),
+        view_stage('overall_view', 'Views:generate_overall_view',
+                   dict(lsoa_pd='lsoa_pd', authority_pd='authority_pd', geometry_tiles='geometry_tiles',
+                        **named('organisations','stps','stps_pd','area_projects')),
+                   config['overall_view']['layers_dir'], config['geometry']['tiles']['directory']),
+        #Shared plotly.js, hashed filenames and precompressed copies for the site
+        Stage(f'package_site@{variant}', 'Views:package_views', inputs=named(*views), outputs=f'assets@{variant}', cache=False,
+              config=config, outdir=outdir),
+    ]
+
+
+def pipeline_stages(path_to_data, config, outdirs, views=tuple(VIEWS.values())):
+
     '''
-    This 'generate' function will output an organisational view, project view and overall view.\n
-    outdir - Specifies output directory (recommended to choose docs folder in mkdocs folder to auto update site)\n
-    output_mode - Choose either external or internal views.\n
-    path_to_data - Folder containing input csv and shape files.\n
-    path_to_config - yaml file containing configuration.\n
-    path_to_site - Folder containing mkdocs documents.
+    Every step of generate as a named stage with its inputs and outputs.\n
+    Each stage lists the files and config sections it reads, which make up its build cache fingerprint.\n
+    outdirs - Dict of output variant -> folder its views are written to, every variant is built in the same run.\n
+    views - Names of the view stages to build, only the stages they need are returned.
     '''
 
-    #Creates out directory if it doesn't exist already
-    if not os.path.exists(outdir):
-        os.makedirs(outdir, exist_ok=True)
+    common=dict(path_to_data=path_to_data, config=config)
+    files=config['files']
+    stages=[
+        #These keep their own record of the files they've converted, so always run
+        Stage('combine_reports', 'Prepare:combine_reports', outputs='combined_report', cache=False, **common),
+        Stage('geometry_cache', 'Geometry:update_geometry_cache', outputs='geometry_cache', cache=False, **common),
+        Stage('area_tables', 'Areas:update_area_tables', outputs='area_tables', cache=False, **common),
+        #Loading input files
+        Stage('load_report', 'Prepare:load_csv', outputs='raw_report', after=['combined_report'], file='implementation_report',
+              reads=[f"{path_to_data}/{files['implementation_report']}"], config_keys=['files'], **common),
+        #Only the ICSs in ics_locations.csv are read, and only the LSOAs and LAs within their bounding box
+        Stage('load_stps', 'Geometry:load_ics_shapes', inputs=['ics_locations'], outputs='stps_shapes', after=['geometry_cache'],
+              reads=partial(geometry_files, path_to_data, config, 'stps'), config_keys=['files','geometry'], **common),
+        Stage('region', 'Geometry:region_bounds', inputs=['stps_shapes'], outputs='region', config_keys=['geometry'], config=config),
+        Stage('load_lsoa', 'Geometry:load_geometry', inputs={'bbox': 'region'}, outputs='lsoa', after=['geometry_cache'], file='lsoas',
+              reads=partial(geometry_files, path_to_data, config, 'lsoas'), config_keys=['files','geometry'], **common),
+        Stage('load_authority', 'Geometry:load_geometry', inputs={'bbox': 'region'}, outputs='authority', after=['geometry_cache'],
+              file='local_authorities', reads=partial(geometry_files, path_to_data, config, 'local_authorities'),
+              config_keys=['files','geometry'], **common),
+        Stage('load_lsoa_table', 'Areas:load_area_table', outputs='lsoa_table', after=['area_tables'], table='lsoas',
+              reads=partial(area_table_files, path_to_data, config, 'lsoas'), config_keys=['files'], **common),
+        Stage('load_authority_table', 'Areas:load_area_table', outputs='authority_table', after=['area_tables'], table='local_authorities',
+              reads=partial(area_table_files, path_to_data, config, 'local_authorities'), config_keys=['files'], **common),
+    ]
+    for file, output in [('organisations','raw_organisations'), ('ics_locations','ics_locations')]:
+        stages.append(Stage(f'load_{output}', 'Prepare:load_csv', outputs=output, file=file,
+                            reads=[f"{path_to_data}/{files[file]}"], config_keys=['files'], **common))
+    stages+=[
+        #Cleaning and joining
+        Stage('prepare_reports', 'Prepare:prepare_reports', inputs=['raw_report','raw_organisations'],
+              outputs=['implementation_report','organisation_counts']),
+        Stage('prepare_lsoa', 'Prepare:prepare_lsoa', inputs=['lsoa','lsoa_table'], outputs='lsoa_pd'),
+        Stage('prepare_authority', 'Prepare:prepare_authority', inputs=['authority','authority_table'], outputs='authority_pd'),
+        #Spatial join of organisations onto the areas, the STRtrees are only rebuilt when the shapefiles change
+        Stage('area_index', 'Spatial:build_indexes', inputs=['lsoa','authority','stps_shapes'], outputs='area_index', cpu_bound=True),
+        #LA and LSOA geometry for the overall view, cut into tiles once and written next to the view of every variant
+        Stage('geometry_tiles', 'Tiles:write_tiles', inputs={'bbox': 'region'}, outputs='geometry_tiles', after=['geometry_cache'], cpu_bound=True,
+              reads=partial(tile_files, path_to_data, config), config_keys=['files','geometry'],
+              valid=partial(tiles_published, list(outdirs.values()), config), outdirs=list(outdirs.values()), **common),
+    ]
+    for variant, outdir in outdirs.items():
+        stages+=variant_stages(config, variant, outdir, views)
+    return select_stages(stages, [f'assets@{variant}' for variant in outdirs])
+
+
+def generate(views=tuple(VIEWS), outdir=None, output_mode='external', path_to_data='data', path_to_config='config_mkdocs.yml', path_to_site='mkdocs', workers=None, processes=True, profile=None, profile_stage=None, cache=True, serve=True):
+
+    '''
+    Builds the given views (any of organisations, projects and overall) and runs the mkdocs site, see Generate for the other arguments.
+    '''
 
     #Opens yml config file, use this file to make minor stylistic edits
     with open(path_to_config, "r") as file:
         config = yaml.safe_load(file)
-    projects_config=config['project_view']
-    organisations_config=config['organisation_view']
-    overall_config=config['overall_view']
-
-    #Checking if implementation data files have been updated since mkdocs last generated
-    def check_report_modification():
-        recent=0
-        if not os.listdir(f"{path_to_data}/{config['files']['individual_reports']}"):
-            return False
-        
-        for filename in os.listdir(f"{path_to_data}/{config['files']['individual_reports']}"):
-            filemod = os.path.getmtime(f"{path_to_data}/{config['files']['individual_reports']}/{filename}")
-            if filemod > recent:
-                recent = filemod
-        if not os.path.exists(f'{outdir}/{overall_config["filename"]}'):
-            return True
-        elif recent > os.path.getmtime(f'{outdir}/{overall_config["filename"]}'):
-            return True
-        else:
-            return False
-
-    #Generating combined_report.csv if required
-    if check_report_modification():
-        df = pd.DataFrame(list())
-        for filename in os.listdir(f"{path_to_data}/{config['files']['individual_reports']}"):
-            filepath = f"{path_to_data}/{config['files']['individual_reports']}/{filename}"
-            filename = filename.replace('.csv', '')
-            myVars = locals()
-            myVars[filename] = pd.read_csv(filepath)
-            myVars[filename]['Portfolio'] = filename
-            myVars[filename]['ProjectName'] = filename + ' - ' + myVars[filename]['ProjectName'] 
-            df = pd.concat([df, myVars[filename]])
-        df.drop_duplicates(subset=None, inplace=True)
-        df.to_csv(f"{path_to_data}/{config['files']['implementation_report']}", index=False)
-        print(f"{config['files']['implementation_report']} has been updated")
-
-    #Checks whether the .geojson shapefiles have been updated
-    def check_shapefile_modification(filename):
-        geojson = os.path.getmtime(f"{path_to_data}/{config['files']['geojson_files'][filename]}")
-        if os.path.exists(f"{path_to_data}/{config['files']['feather_files'][filename]}"):
-            feather = os.path.getmtime(f"{path_to_data}/{config['files']['feather_files'][filename]}")
-            if geojson > feather:
-                return True
-            else:
-                return False
-        else:
-            return True
-    
-    #Converts updated .geojson files to .feather files if required
-    for file in ['lsoas','stps','local_authorities']:
-        if check_shapefile_modification(file):
-            df = geopandas.read_file(f"{path_to_data}/{config['files']['geojson_files'][file]}")
-            df["wkb"] = df.geometry.apply(lambda g: g.wkb)
-            df = df.drop(columns=["geometry"])
-            df.to_feather(f"{path_to_data}/{config['files']['feather_files'][file]}")
-            print(f'{path_to_data}/{config["files"]["geojson_files"][file]} was updated')
-        else:
-            print(f'{path_to_data}/{config["files"]["geojson_files"][file]} is up-to-date')
-
-    #Importing datasets
-    implementation_report=pd.read_csv(f"{path_to_data}/{config['files']['implementation_report']}")
-    organisations=pd.read_csv(f"{path_to_data}/{config['files']['organisations']}")
-
-
-    #Finding number of projects
-    frequencies = implementation_report['Name'].value_counts().rename_axis('Name').reset_index(name='Project Number')
-    organisations = organisations.merge(frequencies, left_on='Name', right_on='Name', how='outer')
-    organisations.replace({'STP: ':'ICS: '},regex=True,inplace=True)
-    implementation_report.replace({'STP: ':'ICS: '},regex=True,inplace=True)
-    organisations['Project Number'] = organisations['Project Number'].fillna(0)
-    implementation_report[['Interest','Stage']]=implementation_report[['Interest','Stage']].fillna('Not Available')
-
-    #Generating dataframes for STPs/ICSs + cleaning data
-    ics_locations=pd.read_csv(f"{path_to_data}/{config['files']['ics_locations']}")
-    stps = gf.from_geofeather(f"{path_to_data}/{config['files']['feather_files']['stps']}")
-    stps.replace({'Cambridgeshire and Peterborough': 'ICS: Cambridge and Peterborough',
-                'Norfolk and Waveney Health and Care Partnership': 'ICS: Norfolk and Waveney',
-                'Suffolk and North East Essex':'ICS: Suffolk and North East Essex',
-                'Bedfordshire, Luton and Milton Keynes': 'ICS: BLMK',
-                'Hertfordshire and West Essex': 'ICS: Herts and West Essex',
-                #'Mid and South Essex': 'ICS: Mid and South Essex'
-                },inplace=True)
-    stps=stps[stps['STP21NM'].isin(ics_locations['Name'])]
-    stps_pd = pd.DataFrame(stps.drop(columns='geometry'))
-    stps_pd.rename(columns={"STP21NM": "Name"},inplace=True)
-    stps_pd = stps_pd.merge(organisations[['Name','Project Number']], left_on='Name', right_on='Name')
-    stps_pd = stps_pd.merge(ics_locations[['Name','Longitude','Latitude']], left_on='Name', right_on='Name')
-    stps_pd=stps_pd.merge(pd.get_dummies(stps_pd['Name']),left_index=True, right_index=True)
-
-
-    #Filtering by region
-    def region_filter(region):
-        filtered_data=implementation_report.query(f'Name.str.contains("{region}")')
-        return filtered_data['ProjectName'].to_list()
-
-    #Adding column for project list with line break formatting
-    names=organisations['Name'].to_list()
-    projects={}
-    for i in names:
-        projects[f"{i}"]='\n'.join((region_filter(f"{i}")))
-    projects=pd.DataFrame.from_dict(projects,orient='index',columns=['Projects'])
-    projects['Projects']=projects['Projects'].str.replace('\n','<br>',regex=True)
-    organisations=organisations.merge(projects,left_on='Name',right_index=True)
-    stps_pd=stps_pd.merge(projects,left_on='Name',right_index=True)
-
-    #Filtering by project
-    implementation_report['Stage Number']=(implementation_report['Stage'].str.extract('(\d+)')).fillna(0)
-    implementation_report['Stage Number'] = pd.to_numeric(implementation_report['Stage Number'])
-    #Creates a stage 3.1, Decision No
-    implementation_report['Project View Stage Number'] = np.where(implementation_report['Stage Number'] > 3, implementation_report['Stage Number'] + 1, implementation_report['Stage Number'])
-    implementation_report['Project View Stage Number'] = implementation_report.apply(lambda x: 4 if ' Yes - ' in x['Interest'] and x['Project View Stage Number'] == 3 else x['Project View Stage Number'], axis=1)
-
-    #Find which organisations are involved in each project
-    project_names = sorted(set(implementation_report['ProjectName']))
-    project_dfs={}
-    for i in project_names:
-        project_dfs[i]=organisations.query(f'Projects.str.contains("{i}",regex = False)')
-        project_dfs[i]=project_dfs[i].merge(implementation_report.query(f'ProjectName.str.contains("{i}",regex = False)'),left_on='Name',right_on='Name')
-
-    #Creating LSOA data
-    ethnicity=pd.read_csv(f"{path_to_data}/{config['files']['ethnicity']}")
-    imd=pd.read_csv(f"{path_to_data}/{config['files']['imds']}")
-    age=pd.read_csv(f"{path_to_data}/{config['files']['age']}")
-    age['population'] = pd.Series(dtype=int)
-    age['population'] = np.where(True, (age['Age 65 and over'] + age['Age 0 to 24'] + age['Age 25 to 49'] + age['Age 50 to 64']), age['population'])
-    age['Age 65 and over'] = np.where(True, round(100*(age['Age 65 and over']/age['population']), 1), age['Age 65 and over'])
-
-    #Cleaning lsoa shapefile
-    lsoa = gf.from_geofeather(f"{path_to_data}/{config['files']['feather_files']['lsoas']}") 
-    lsoa_pd = pd.DataFrame(lsoa.drop(columns='geometry'))
-    lsoa_pd= lsoa_pd.merge(ethnicity,left_on='LSOA11CD',right_on='LSOA_CODE')
-    lsoa_pd= lsoa_pd.merge(age,left_on='LSOA11CD',right_on='LSOA_CODE')
-    lsoa_pd= lsoa_pd.merge(imd,left_on='LSOA11CD',right_on='lsoa11cd')
-    lsoa_pd.rename(columns={"IMDDec0":"Index of multiple deprivation decile"},inplace=True)
-
-    #Generating dataframes for LAs
-    population_regional=pd.read_csv(f"{path_to_data}/{config['files']['population_regional']}")
-    imd_regional=pd.read_csv(f"{path_to_data}/{config['files']['imd_regional']}")
-    ethnicity_regional=pd.read_csv(f"{path_to_data}/{config['files']['ethnicity_regional']}")
-
-    #Cleaning LA shapefile
-    authority = gf.from_geofeather(f"{path_to_data}/{config['files']['feather_files']['local_authorities']}")
-    authority_pd = pd.DataFrame(authority.drop(columns='geometry'))
-    authority_pd= (authority_pd.merge(imd_regional,left_on='LAD21CD',right_on='Local Authority District code (2019)')).drop(columns='Local Authority District code (2019)')
-    authority_pd= (authority_pd.merge(population_regional,left_on='LAD21CD',right_on='Area code')).drop(columns='Area code')
-    authority_pd= (authority_pd.merge(ethnicity_regional,left_on='LAD21CD',right_on='Area code')).drop(columns='Area code')
-    authority_pd=authority_pd[authority_pd['LAD21CD'].str.startswith('E09')==False]
-    areas_to_drop=['South Oxfordshire','Oadby and Wigston','Harborough','Melton','Rutland']
-    authority_pd=authority_pd[~authority_pd['LAD21NM'].str.contains('|'.join(areas_to_drop))]
-    authority_customdata=authority_pd[['LAD21NM','Income deprivation rate quintile','BAME %',r'% of all persons 65+']]
-
-    #Function to create a colour scale based on 
-    def colorbar_discretize(colour,colour_indices):
-        n_cat=len(colour_indices)
-        colour_list=[]
-        colourscale=[]
-        n=0
-        for i in range(0,n_cat):
-                colour_list.append(colour[colour_indices[i]])
-                colourscale.append([i/n_cat,colour_list[i]])
-                colourscale.append([(i+1)/n_cat,colour_list[i]])
-        return(colourscale)
-
-    def select_button(button_list):
-        button_list.insert(0,dict(label = 'Select...',
-            method = 'update',
-            args = [{'visible': False},
-                    {'title': f'Please Select',
-                    'showlegend':True}],
-            ))
-        return button_list
-
-    def generate_organisation_view():
-
-        organisations_bar=go.Figure()
-                
-        #Creates organisation dataframe, including differentiating between Stage 3 Yes & No outcomes
-        organisations_dfs=[]
-        implementation_report['Project Ended?']=np.where((implementation_report['Stage Number']==3) & (implementation_report['Interest'].str.contains('Decision No')),'Yes','No')
-        for idx, organisation in enumerate(sorted(set(implementation_report['Name']))):
-            organisations_dfs.append(implementation_report[implementation_report['Name']==organisation])
-            organisations_dfs[idx]['Color']=np.where(organisations_dfs[idx]['Project Ended?']=='Yes',organisations_config['decision_no_color'],organisations_config['other_project_color'])
-            organisations_dfs[idx]['WhyImportant'].fillna('',inplace=True)
-            organisations_dfs[idx]['WhyImportant']=organisations_dfs[idx]['WhyImportant'].str.findall('.' * 50).map('<br>'.join)
-
-        #Adds a button in the dropdown for each organisation
-        buttons_orgs=[]
-        visibility_orgs=[False]*len(organisations_dfs)
-        annotation=[
-                {   
-                    "text": "Please select an organisation",
-                    "xref": "paper",
-                    "yref": "paper",
-                    "showarrow": False,
-                    "font": {
-                        "size": 28
-                    }
-                }
-            ]
-        for idx, organisation in enumerate(organisations_dfs):
-                organisations_bar.add_bar(
-                        x=organisation['Stage Number'],
-                        y=organisation['ProjectName'],
-                        visible=False,
-                        showlegend=False,
-                        orientation='h',
-                        marker_color=organisation['Color'],
-                        customdata=organisation,
-                        hovertemplate="<br>".join([
-                                "<b>%{customdata[3]}</b><extra></extra>"]),
-                )
-                #Creating dropdown, so it updates chart and title
-                visibility_orgs[idx]=True
-                buttons_orgs.append(dict(label = organisation['Name'].iloc[0],
-                    method = 'update',
-                    args = [{'visible': visibility_orgs},
-                            {'title': f'{organisations_config["title_organisation"]} {organisation["Name"].iloc[0]}{organisations_config["subheading"]}',
-                            'showlegend':True,
-                            'xaxis':{
-                                    'tickmode':'array',
-                                    'tickvals':[0,1,2,3,4,5,6,7],
-                                    'ticktext':['0 - No Information','1 - Knowledge', '2 - Interest', '3 - Decision', '4 - Implementation', 
-                                                '5 - Adoption', '6 - Spread<br><sup>(PSC Only)</sup>','7 - Sustained<br><sup>(PSC Only)</sup>'],
-                                    'range':[0,7],
-                                    'title':{'text':'Stage Number'}
-                                    },
-                            "annotations": []
-                            }
-                            ])
-                )
-                visibility_orgs=[False]*len(organisations_dfs)
-        buttons_orgs.insert(0,dict(label = 'Select...',
-            method = 'update',
-            args = [{'visible': False},
-                    {'title': f'Please Select',
-                    'showlegend':True,
-                    "annotations": annotation}],
-            ))
-        #Creating bar chart
-        organisations_bar.update_yaxes(
-            title_text='Project',
-        )
-        organisations_bar.update_layout(
-            title=dict(
-                yanchor="top", xanchor="left",
-                y=0.97, x=0.015,
-                text=f'{organisations_config["title_default"]} {organisations_config["subheading"]}'),
-            margin=dict(
-                t=80, b=10,
-                r=15, l=15,),
-            updatemenus=[
-                {"buttons": buttons_orgs,'x':organisations_config["button_pos_x"],'y':organisations_config["button_pos_y"],}],
-            annotations = annotation
-        )
-        visibility_orgs=[False]*len(organisations_dfs)
-
-        #Outputting pioorgs.html file
-        pio.write_html(organisations_bar, file=f'{outdir}/{organisations_config["filename"]}', auto_open=False)
-        print(f'{organisations_config["filename"]} was created')
-
-    def generate_project_view():
-
-        project_fig = go.Figure()
-
-        #Creating scatter traces for each project
-        for i in project_names:
-            project_fig.add_scattermapbox(lat = project_dfs[i]['Latitude']
-                            ,lon = project_dfs[i]['Longitude']
-                            ,hovertext = project_dfs[i]['Name']
-                            ,customdata = project_dfs[i]
-                            ,hovertemplate="<br>".join([
-                                "<b>%{customdata[0]}</b><extra></extra>",
-                                "<br>%{customdata[8]}",
-                                ])
-                            ,visible=False
-                            ,marker_size=15
-                            ,marker_colorscale=colorbar_discretize([getattr(px.colors.sequential,projects_config['colorbar'])[i] for i in [1,2,3,4,5,6,7,8]],
-                                                                    [0,1,2,3,4,5,6,7])
-                            ,marker_color= project_dfs[i]['Project View Stage Number']
-                            ,marker_cmin=0
-                            ,marker_cmax=7
-                            ,marker_showscale=True
-                            ,marker_colorbar_title_text='Stage Number'
-                            ,marker_colorbar_ticktext=[' 0 - No Information',' 1 - Knowledge', ' 2 - Interest', ' 3 - Decision: No',
-                                                        '3.1 - Decision:Yes', ' 4 - Implementation', ' 5 - Adoption', '<br> 6 - Spread<br><sup>(Only PSC)</sup>']
-                            ,marker_colorbar_tickvals=[0,1,2,3,4,5,6,7]
-                            ,name=i
-                            ,showlegend=False
-                            ,opacity=projects_config['opacity']
-                            )
-
-        #Adding dropdown buttons for each project
-        visibility=[False]*len(project_names)
-        buttons_projects=[]
-        for idx, name in enumerate(project_names):
-            visibility[idx]=True
-            buttons_projects.append(dict(label = name,
-            method = 'update',
-            args = [{'visible': visibility},
-                    {'title': f'{projects_config["title_project"]} {name}{projects_config["subheading"]}',
-                    'showlegend':True}],
-            ))
-            visibility=[False]*len(project_names)
-        select_button(buttons_projects)
-        
-        #Matching each project to a portfolio
-        project_names_df = pd.DataFrame(project_names)
-        portfolios=set(implementation_report['Portfolio'])
-        visibility_portfolios={}
-        for portfolio in portfolios:
-                visibility_portfolios[portfolio]=project_names_df[0].str.startswith(portfolio)
-
-        #Adding dropdown buttons for each portfolio
-        buttons_programmes=[]
-        for portfolio in portfolios:
-                buttons_programmes.append(dict(label = portfolio,
-                        method = 'update',
-                        args = [{'visible': visibility_portfolios[portfolio]},
-                        {'title': f'{projects_config["title_portfolio"]} {portfolio} {projects_config["subheading"]}'}]
-                        ))
-        select_button(buttons_programmes)
-
-        #Creating project view map
-        project_fig.update_layout(
-            title=dict(
-                text=f'{projects_config["title_default"]}{projects_config["subheading"]}',
-                yanchor="top", xanchor="left",
-                y=0.98, x=0.001),
-            legend=dict(
-                yanchor="top", xanchor="left",
-                y=0.98, x=0.01,),
-            mapbox=dict(
-                style="open-street-map",
-                zoom=projects_config['zoom'],
-                center={"lat": 52.1951, "lon": 0.1313}),
-            updatemenus=[
-                {"buttons": buttons_projects,'x':projects_config["project_button"]["pos_x"],'y':projects_config["project_button"]["pos_y"]},
-                {"buttons": buttons_programmes,'x': projects_config["portfolio_button"]["pos_x"],'y':projects_config["portfolio_button"]["pos_y"]}],
-            margin=dict(
-                t=80, b=10,
-                r=10, l=10,),
-            hoverdistance=10,
-            )
-        
-        pio.write_html(project_fig, file=f'{outdir}/{projects_config["filename"]}', auto_open=False)
-        print(f'{projects_config["filename"]} was created')
-
-    def generate_overall_view():
-
-        fig = go.Figure()
-
-        buttons_1=[]
-        visibility=[False]*7+[False]*len(stps_pd['Name'])+[True]
-        df_customdata=lsoa_pd[['lsoa11nm','BAME %','Age 65 and over','Index of multiple deprivation decile']]
-
-        #Adding choropleth map for each shapefile
-        for idx, descriptor in enumerate(['LA: Income deprivation rate quintile','LA: BAME %',r'LA: % of all persons 65+','LSOA: Index of multiple deprivation decile','LSOA: BAME %','LSOA: Age 65 and over','ICSs']):
-            if 'LA:' in descriptor:
-                fig.add_trace(
-                go.Choroplethmapbox(
-                                geojson=authority.__geo_interface__,
-                                customdata=authority_customdata,
-                                locations=authority_pd['LAD21NM'],
-                                featureidkey="properties.LAD21NM",
-                                z=authority_pd[descriptor.replace('LA: ','')],
-                                name = descriptor,
-                                visible=False))
-            elif 'LSOA:' in descriptor:
-                fig.add_trace(
-                go.Choroplethmapbox(
-                                geojson=lsoa.__geo_interface__,
-                                customdata=df_customdata,
-                                locations=lsoa_pd.index,
-                                z=lsoa_pd[descriptor.replace('LSOA: ','')],
-                                name = descriptor,
-                                visible=False))
-            elif 'ICSs' in descriptor:
-                fig.add_trace(
-                go.Choroplethmapbox(
-                                geojson=stps.__geo_interface__,
-                                customdata=stps_pd,
-                                locations=stps.index,
-                                z=stps_pd['Project Number'],
-                                name = descriptor))
-            visibility[idx]=True
-            #Adding each choropleth map to a dropdown
-            buttons_1.append(dict(label = f'{descriptor}',
-                                    method = 'update',
-                                    args = [{'visible': visibility,'showscale':visibility},
-                                            {'title': f'{descriptor}{overall_config["subheading"]}',
-                                            'showlegend':True,
-                                            }],
-                                    ))
-            visibility=[False]*7+[False]*len(stps_pd['Name'])+[True]
-        select_button(buttons_1)
-
-        #Adding choropleth maps for each ICS then adding them to a dropdown
-        buttons_ics=[]
-        for idx, name in enumerate(stps_pd['Name']):
-            fig.add_trace(
-                go.Choroplethmapbox(
-                                geojson=stps.__geo_interface__,
-                                customdata=stps_pd,
-                                locations=stps.index,
-                                z=stps_pd[name],
-                                name = name,
-                                visible=False
-                ))
-            visibility[7+idx]=True
-            buttons_ics.append(dict(label = name,
-                        method = 'update',
-                        args = [{'visible': visibility,'showscale':False,},
-                        {'title': f'{name}{overall_config["subheading"]}',}
-                        ]
-                        )
-                    )
-            visibility=[False]*7+[False]*len(stps_pd['Name'])+[True]
-        select_button(buttons_ics)
-        
-        #Calculates the maximum number of projects an ICS has
-        max_ics = 0
-        for item in stps_pd['Project Number']:
-            if int(item) > max_ics:
-                 max_ics = int(item)
-        if max_ics > 8:
-            max_ics = 8
-
-        #For each choropleth map, update the colours, colorbars, titles
-        fig.update_traces(selector=({'name':'ICSs'}),
-                        marker_opacity=0.5,
-                        hovertemplate="<br>".join([
-                                "<b>%{customdata[2]}</b><extra></extra>",
-                                "Project Number: %{customdata[10]}<br>",
-                                "%{customdata[18]}",
-                                ]),
-                        colorscale=colorbar_discretize(getattr(px.colors.sequential,overall_config['colorbars']['ics']),list(range(1,max_ics+2))),
-                        zmin=0,
-                        zmax=max_ics+1,
-                        colorbar_tickvals=list(range(0,max_ics+1)),
-                        colorbar_title='No. of Projects in ICS',
-                        colorbar_tickmode = 'array',
-                        visible=False
-                        )     
-
-        fig.update_traces(selector=({'name':'LSOA: BAME %'}),
-                        marker_opacity=0.3,
-                        hovertemplate="<br>".join([
-                                "<b>%{customdata[0]}</b><extra></extra>",
-                                "<br>% BAME: %{customdata[1]}",
-                                ]),
-                        colorscale=overall_config['colorbars']['lsoa_bame'],
-                        colorbar_title='BAME %'
-                        )
-
-        fig.update_traces(selector=({'name':'LSOA: Age 65 and over'}),
-                        marker_opacity=0.3,
-                        hovertemplate="<br>".join([
-                                "<b>%{customdata[0]}</b><extra></extra>",
-                                "<br>Population over 65: %{customdata[2]}",
-                                ]),
-                        colorscale=overall_config['colorbars']['lsoa_age'],
-                        colorbar_title=r'% Over 65'
-                        )
-
-        fig.update_traces(selector=({'name':'LSOA: Index of multiple deprivation decile'}),
-                        marker_opacity=0.3,
-                        hovertemplate="<br>".join([
-                                "<b>%{customdata[0]}</b><extra></extra>",
-                                "<br>IMD Decile: %{customdata[3]}",
-                                ]),
-                        colorscale=colorbar_discretize(getattr(px.colors.sequential,overall_config['colorbars']['lsoa_imd'])+['rgb(255,255,255)'],[0,1,2,3,4,5,6,7,8,9]),
-                        colorbar_tickvals=[1,2,3,4,5,6,7,8,9,10],
-                        colorbar_ticktext=[' 1 - Most Deprived','2', '3',
-                                            '4', '5', '6','7','8','9','10 - Least Deprived'],
-                        colorbar_tickmode = 'array',
-                        colorbar_title='IMD Decile'
-                        )
-
-        #formatting each view
-        fig.update_traces(selector=({'name':'LA: Income deprivation rate quintile'}),
-                        marker_opacity=0.5,
-                        hovertemplate="<br>".join([
-                                "<b>%{customdata[0]}</b><extra></extra>",
-                                "<br>IncDep Quintile: %{customdata[1]}",
-                                ]),
-                        colorscale=colorbar_discretize(getattr(px.colors.sequential,overall_config['colorbars']['la_imd']),[0,2,4,6,8]),
-                        colorbar_tickvals=[1,2,3,4,5],
-                        colorbar_ticktext=[' 1 - Most Deprived','2', '3',
-                                            '4', '5 - Least Deprived'],
-                        colorbar_tickmode = 'array',
-                        colorbar_title='IncDep Quintile'
-                        )
-
-        fig.update_traces(selector=({'name':'LA: BAME %'}),
-                        marker_opacity=0.5,
-                        hovertemplate="<br>".join([
-                                "<b>%{customdata[0]}</b><extra></extra>",
-                                "<br>% BAME: %{customdata[2]}",
-                                ]),
-                        colorscale=getattr(px.colors.sequential,overall_config['colorbars']['la_bame']),
-                        colorbar_title='BAME %'
-                        )
-
-        fig.update_traces(selector=({'name':r'LA: % of all persons 65+'}),
-                        marker_opacity=0.5,
-                        hovertemplate="<br>".join([
-                                "<b>%{customdata[0]}</b><extra></extra>",
-                                "<br>Over 65 %: %{customdata[3]}",
-                                ]),
-                        colorscale=getattr(px.colors.sequential,overall_config['colorbars']['la_age']),
-                        colorbar_title=r'% Over 65'
-                        )
-
-        for idx, name in enumerate(stps_pd['Name']):
-            fig.update_traces(selector=({'name':f'{name}'}),
-                        marker_opacity=0.3,
-                        hovertemplate="<br>".join([
-                                "<b>%{customdata[2]}</b><extra></extra>",
-                                "Project Number: %{customdata[10]}<br>",
-                                "%{customdata[18]}",
-                                ]),
-                        colorscale=getattr(px.colors.sequential,overall_config['colorbars']['ics_selection']),
-                        )                                                 
-
-        #Adding organisations scatter layer
-        fig.add_scattermapbox(lat = organisations['Latitude']
-                            ,lon = organisations['Longitude']
-                            ,hovertext = organisations['Name']
-                            ,customdata = organisations
-                            ,hovertemplate="<br>".join([
-                                "<b>%{customdata[0]}</b><extra></extra>",
-                                "Project Number: %{customdata[4]}<br>",
-                                "%{customdata[5]}",
-                                ])
-                            ,marker_color= organisations['Project Number']
-                            ,marker_colorscale=colorbar_discretize(getattr(px.colors.sequential,overall_config['colorbars']['scatter']),[0,1,2,3,4,5,6,7,8,9,10])
-                            ,marker_colorbar_title_text='No. of Projects (Scatter plot)'
-                            ,marker_colorbar_ticktext=list(range(int(min(organisations['Project Number'])),int(max(organisations['Project Number']+1))))
-                            ,marker_colorbar_tickvals=list(range(int(min(organisations['Project Number'])),int(max(organisations['Project Number']+1))))
-                            ,marker_colorbar_tickmode='array'
-                            ,marker_colorbar_x=0.52
-                            ,marker_colorbar_y=-0.22
-                            ,marker_colorbar_orientation='h'
-                            ,marker_size=10
-                            ,name='Organisations'
-                            ,opacity=0.9
-                            ,visible=False
-                            ,showlegend=True
-                            )
-        #Styling the map
-        fig.update_layout(title=dict(
-                                text=f'{overall_config["title_default"]} {overall_config["subheading"]}',
-                                yanchor="top", xanchor="left",
-                                y=0.96, x=0.02),
-                        mapbox=dict(
-                            style="open-street-map",
-                            zoom=6,
-                            center={"lat": 52.1951, "lon": 0.1313}),
-                        legend=dict(
-                        yanchor="top",
-                        y=0.99,
-                        xanchor="left",
-                        x=0.01
-                        ),
-                        updatemenus=[
-                            {"buttons": buttons_1,'x':overall_config['heatmap_button']["pos_x"],'y':overall_config['heatmap_button']["pos_y"],'active':0},
-                            {"buttons": buttons_ics,'x':overall_config['ics_button']["pos_x"],'y':overall_config['ics_button']["pos_y"]}],)
-        
-        #Output overall view
-        pio.write_html(fig, file=f'{outdir}/{overall_config["filename"]}', auto_open=False)
-        print(f'{overall_config["filename"]} was created')
-
-    if output_mode == 'internal':
-        
-        generate_organisation_view()
-        generate_project_view()
-        generate_overall_view()
-
-    if output_mode == 'external':
-
-        generate_organisation_view()
-        generate_project_view()
-        generate_overall_view()
-        
+
+    #Creates the out directory of each variant if it doesn't exist already
+    outdirs = variant_outdirs(config, output_mode, outdir)
+    for directory in outdirs.values():
+        os.makedirs(directory, exist_ok=True)
+
+    #Profiling records
+    records,pstats_path=None,None
+    if profile or profile_stage:
+        records=[]
+        profile=profile if isinstance(profile,str) else 'profile_report.json'
+        pstats_path=f'{os.path.splitext(profile)[0]}_{profile_stage}.pstats' if profile_stage else None
+
+    run_pipeline(pipeline_stages(path_to_data, config, outdirs, [VIEWS[view] for view in views]), workers=workers or os.cpu_count() or 1,
+                 processes=processes, records=records, profile_stage=profile_stage, pstats_path=pstats_path,
+                 cache=BuildCache(f"{path_to_data}/{config['files']['build_cache']}") if cache else None)
+
+    if records is not None:
+        write_report(records, profile)
+        print_summary(records, pstats_path)
+        print(f'Profile report was written to {profile}')
+
     #generate mkdocs site
-    subprocess.run('mkdocs serve',cwd=path_to_site)
-        
+    if serve:
+        warn_unpublished(outdirs, path_to_site)
+        subprocess.run('mkdocs serve',cwd=path_to_site)
+
+
+#Defines the command needed to run this code, an example command could be: python mapping.py generate --outdir mkdocs/docs
+class Generate(object):
+
+    '''
+    generate builds all three views, generate organisations, generate projects or generate overall rebuilds a single view
+    (the organisation and project views don't load any shapefiles or demographic data).
+    '''
+
+    def __call__(self, outdir=None, output_mode='external', path_to_data='data', path_to_config='config_mkdocs.yml', path_to_site='mkdocs', workers=None, processes=True, profile=None, profile_stage=None, cache=True, serve=True):
+
+        '''
+        This 'generate' function will output an organisational view, project view and overall view.\n
+        outdir - Specifies output directory (recommended to choose docs folder in mkdocs folder to auto update site). Defaults to the
+        variant's outdir in the config (mkdocs/internal for internal), or mkdocs/docs if it has none.\n
+        output_mode - Output variant to build (external or internal, see output_variants in the config), or several separated by commas
+        (e.g. --output_mode=internal,external), which are all built in one run from the same loaded data. outdir can only be given
+        with a single variant, several are each written to their default folder.\n
+        path_to_data - Folder containing input csv and shape files.\n
+        path_to_config - yaml file containing configuration.\n
+        path_to_site - Folder containing mkdocs documents.\n
+        workers - Number of stages (file loads, joins and views) run at once, defaults to the number of CPUs. 1 runs every stage in turn.\n
+        processes - Build the views in separate processes rather than threads.\n
+        profile - Records each stage's wall time, CPU time, rise in the process's peak memory (only the stage's own with --workers 1), rows and bytes processed and the size of each trace written,
+        to a JSON report (or CSV if the file ends with .csv). --profile on its own writes profile_report.json.\n
+        profile_stage - Name of a stage (e.g. overall_view@external) to also run under cProfile, its stats are dumped next to the report.\n
+        cache - Reuse the outputs of stages whose input files, config section and code haven't changed, --nocache rebuilds everything.\n
+        serve - Run mkdocs serve once the views are built.
+        '''
+
+        generate(tuple(VIEWS), outdir, output_mode, path_to_data, path_to_config, path_to_site, workers, processes, profile, profile_stage, cache, serve)
+
+    def organisations(self, outdir=None, output_mode='external', path_to_data='data', path_to_config='config_mkdocs.yml', path_to_site='mkdocs', profile=None, cache=True, serve=False):
+        '''
+        Rebuilds the organisation view only, arguments as for generate.
+        '''
+        generate(['organisations'], outdir, output_mode, path_to_data=path_to_data, path_to_config=path_to_config, path_to_site=path_to_site, profile=profile, cache=cache, serve=serve)
+
+    def projects(self, outdir=None, output_mode='external', path_to_data='data', path_to_config='config_mkdocs.yml', path_to_site='mkdocs', profile=None, cache=True, serve=False):
+        '''
+        Rebuilds the project view only, arguments as for generate.
+        '''
+        generate(['projects'], outdir, output_mode, path_to_data=path_to_data, path_to_config=path_to_config, path_to_site=path_to_site, profile=profile, cache=cache, serve=serve)
+
+    def overall(self, outdir=None, output_mode='external', path_to_data='data', path_to_config='config_mkdocs.yml', path_to_site='mkdocs', workers=None, profile=None, cache=True, serve=False):
+        '''
+        Rebuilds the overall view only, arguments as for generate.
+        '''
+        generate(['overall'], outdir, output_mode, path_to_data=path_to_data, path_to_config=path_to_config, path_to_site=path_to_site, workers=workers, profile=profile, cache=cache, serve=serve)
+
+
+def ingest(path_to_data='data', path_to_config='config_mkdocs.yml'):
+
+    '''
+    Converts changed input files only (the combined report, cached shapefiles and demographic tables), without building any views.
+    '''
+
+    with open(path_to_config, "r") as file:
+        config = yaml.safe_load(file)
+    stages=select_stages(pipeline_stages(path_to_data, config, outdirs={}), INGEST)
+    run_pipeline(stages, workers=len(stages))
+
+
+def export(outdir=None, output_mode='external', path_to_data='data', path_to_config='config_mkdocs.yml', workers=None, cache=True):
+
+    '''
+    Renders a static image (PNG and PDF by default, see export in the config) of every project, portfolio and organisation
+    in the project and organisation views, e.g. for board packs.\n
+    outdir - Folder the images are written to, defaults to the export directory in the config. Each variant gets a folder in it.\n
+    output_mode, path_to_data, path_to_config, cache - As for generate, the frames are shared with it through the build cache.\n
+    workers - Number of renderer processes, defaults to the number of CPUs.\n
+    Images whose figure, format and size are unchanged since the last export aren't rendered again.
+    '''
+
+    from Views import organisation_figure, project_figure
+    from Export import export_figures
+    with open(path_to_config, "r") as file:
+        config = yaml.safe_load(file)
+    outdir=outdir or config['export']['directory']
+    outdirs={variant: f'{outdir}/{variant}' for variant in variant_outdirs(config, output_mode)}
+    frames=['implementation_report','project_names','membership']
+    build_cache=BuildCache(f"{path_to_data}/{config['files']['build_cache']}") if cache else None
+    values=run_pipeline(select_stages(pipeline_stages(path_to_data, config, outdirs), [f'{frame}@{variant}' for frame in frames for variant in outdirs]),
+                        workers=workers or os.cpu_count() or 1, cache=build_cache)
+    if build_cache is not None:
+        values={name: build_cache.resolve(value) for name, value in values.items()}
+    for variant in outdirs:
+        report, project_names, membership=[values[f'{frame}@{variant}'] for frame in frames]
+        export_figures({'organisation_view': organisation_figure(report, config),
+                        'project_view': project_figure(project_names, membership, report, config)},
+                       config, f'{outdir}/{variant}', workers=workers or os.cpu_count() or 1)
+
+
+def watch(outdir=None, output_mode='external', path_to_data='data', path_to_config='config_mkdocs.yml', path_to_site='mkdocs', workers=None, interval=1, debounce=2, serve=True):
+
+    '''
+    Builds the site, then keeps running and rebuilds it whenever a data file or the config changes.\n
+    Every stage's outputs stay in memory between rebuilds, so only the stages affected by a change run again (e.g. an
+    edited portfolio report rebuilds the combined report and the organisation and project views, without reloading the shapefiles).\n
+    outdir, output_mode, path_to_data, path_to_config, path_to_site - As for generate.\n
+    workers - Number of stages run at once (in threads, so the frames aren't copied to other processes), defaults to the number of CPUs.\n
+    interval - Seconds between checks for changed files.\n
+    debounce - Seconds the files must be unchanged for before rebuilding, so a burst of edits only causes one rebuild.\n
+    serve - Also runs mkdocs serve, which reloads the site in the browser after each rebuild.\n
+    Changes to the code itself need a restart.
+    '''
+
+    def read_config():
+        with open(path_to_config, "r") as file:
+            return yaml.safe_load(file)
+    config=read_config()
+    cache=BuildCache(f"{path_to_data}/{config['files']['build_cache']}")
+    if serve:
+        warn_unpublished(variant_outdirs(config, output_mode, outdir), path_to_site)
+    site=subprocess.Popen(['mkdocs','serve'],cwd=path_to_site) if serve else None
+    try:
+        state=snapshot(watched_files(path_to_data, config, path_to_config))
+        while True:
+            start=time.perf_counter()
+            records=[]
+            try:
+                outdirs=variant_outdirs(config, output_mode, outdir)
+                for directory in outdirs.values():
+                    os.makedirs(directory, exist_ok=True)
+                run_pipeline(pipeline_stages(path_to_data, config, outdirs), workers=workers or os.cpu_count() or 1, records=records, cache=cache)
+                print(f'Rebuilt {", ".join(record["stage"] for record in records)} in {time.perf_counter()-start:.1f}s')
+            #A half-edited file shouldn't stop the watcher, the next change triggers another attempt
+            except Exception as error:
+                print(f'Rebuild failed: {error!r}')
+            print(f'Watching {path_to_data} and {path_to_config} for changes')
+            state,changed=wait_for_changes(lambda: watched_files(path_to_data, config, path_to_config), state, interval, debounce)
+            print(f'Changed: {", ".join(changed)}')
+            if path_to_config in changed:
+                try:
+                    config=read_config()
+                except yaml.YAMLError as error:
+                    print(f'{path_to_config} could not be read, keeping the previous config: {error}')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if site is not None:
+            site.terminate()
+
+
+def publish(outdir=None, output_mode='external', path_to_data='data', path_to_config='config_mkdocs.yml', path_to_site='mkdocs', site_dir='site', workers=None, build_views=True, host='127.0.0.1', port=8000, serve=True):
+
+    '''
+    Builds the views, builds the site with mkdocs build and serves it from a caching static file server, in place of mkdocs serve.\n
+    outdir, output_mode, path_to_data, path_to_config, path_to_site, workers - As for generate.\n
+    site_dir - Folder the site is built in, relative to path_to_site.\n
+    build_views - Run generate first, turn off to only rebuild the site from the current docs folder.\n
+    host, port - Address the site is served on, use host 0.0.0.0 to serve other machines.\n
+    serve - Serve the site once it is built.\n
+    Fails if a variant is written outside the docs folder of the site (e.g. --output_mode internal without --outdir), as
+    mkdocs wouldn't publish it.\n
+    Every text file of the built site gets precompressed .gz/.br copies. The server sends those to browsers that accept
+    them, answers repeat requests with 304 Not Modified (ETag/Last-Modified) and lets browsers keep the content-hashed
+    views, plotly.js and overview fragments without revalidating them.
+    '''
+
+    from Bundle import precompress_site
+    from Server import serve_site
+    with open(path_to_config, "r") as file:
+        config = yaml.safe_load(file)
+    if build_views:
+        unpublished=unpublished_variants(variant_outdirs(config, output_mode, outdir), path_to_site)
+        if unpublished:
+            raise ValueError(f"{', '.join(f'{variant} views are written to {directory}' for variant, directory in unpublished.items())}, "
+                             f"outside {docs_dir(path_to_site)} which the site is built from. Pass --outdir {docs_dir(path_to_site)} to publish them")
+        generate(outdir=outdir, output_mode=output_mode, path_to_data=path_to_data, path_to_config=path_to_config,
+                 path_to_site=path_to_site, workers=workers, serve=False)
+    subprocess.run(['mkdocs','build','--clean','--site-dir',site_dir],cwd=path_to_site,check=True)
+    site=os.path.join(path_to_site, site_dir)
+    precompress_site(site, config.get('bundle', {}).get('compression_level', 9))
+    print(f'The site was built in {site}')
+    if serve:
+        serve_site(site, host, port)
+
 
 class Pipeline(object):
     def __init__(self):
-        self.generate=generate
+        self.generate=Generate()
+        self.ingest=ingest
+        self.export=export
+        self.watch=watch
+        self.publish=publish
+
+#generate used to take its arguments positionally (python Mapping.py generate mkdocs/docs external), fire would now read
+#the first as the name of a subcommand, so they're passed on as flags (--outdir mkdocs/docs --output_mode external)
+def positional_outdir(args):
+    if len(args)<2 or args[0]!='generate' or args[1].startswith('-') or args[1] in VIEWS:
+        return args
+    positional=len(args)-1
+    for idx, arg in enumerate(args[1:]):
+        if arg.startswith('-'):
+            positional=idx
+            break
+    names=list(inspect.signature(Generate.__call__).parameters)[1:]
+    flags=[item for name, value in zip(names, args[1:1+positional]) for item in (f'--{name}', value)]
+    return args[:1]+flags+args[1+positional:]
 
 if __name__ == "__main__":
-    fire.Fire(Pipeline)
-
-    
+    fire.Fire(Pipeline, command=positional_outdir(sys.argv[1:]))
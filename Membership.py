@@ -0,0 +1,19 @@
+#Exact organisation <-> project association table, one row per implementation report row at a known organisation
+def organisation_projects(organisations, implementation_report):
+    return organisations.merge(implementation_report, left_on='Name', right_on='Name')
+
+
+#Project list for each organisation, with line break formatting
+def project_lists(organisations, implementation_report):
+    names = organisations['Name'].drop_duplicates()
+    projects = implementation_report.groupby('Name', sort=False)['ProjectName'].agg('\n'.join)
+    projects = projects.reindex(names).fillna('').to_frame('Projects')
+    projects['Projects'] = projects['Projects'].str.replace('\n', '<br>', regex=True)
+    return projects
+
+
+#Splits the association table into one frame of organisations per project
+def project_frames(membership, project_names):
+    groups = dict(tuple(membership.groupby('ProjectName', sort=False)))
+    empty = membership.iloc[0:0]
+    return {name: groups.get(name, empty) for name in project_names}
@@ -0,0 +1,117 @@
+import warnings
+import pandas as pd
+import numpy as np
+from Reports import update_combined_report
+from Membership import organisation_projects, project_lists
+
+#Ignoring warning outputs
+pd.options.mode.chained_assignment = None  # default='warn'
+warnings.filterwarnings('ignore', message='.*crs will be set for this GeoDataFrame.*')
+
+#Names the ICSs are shown with, by their STP name in the shapefile
+ICS_NAMES={'Cambridgeshire and Peterborough': 'ICS: Cambridge and Peterborough',
+           'Norfolk and Waveney Health and Care Partnership': 'ICS: Norfolk and Waveney',
+           'Suffolk and North East Essex':'ICS: Suffolk and North East Essex',
+           'Bedfordshire, Luton and Milton Keynes': 'ICS: BLMK',
+           'Hertfordshire and West Essex': 'ICS: Herts and West Essex',
+           #'Mid and South Essex': 'ICS: Mid and South Essex'
+           }
+
+
+#Updating combined_report.csv from any added, changed or removed portfolio reports
+def combine_reports(path_to_data, config):
+    updated = update_combined_report(path_to_data, config)
+    if updated:
+        print(f"{config['files']['implementation_report']} has been updated")
+    return updated
+
+
+def load_csv(path_to_data, config, file):
+    return pd.read_csv(f"{path_to_data}/{config['files'][file]}")
+
+
+#Number of report rows of each organisation
+def count_projects(implementation_report, organisations):
+    frequencies = implementation_report['Name'].value_counts().rename_axis('Name').reset_index(name='Project Number')
+    organisations = organisations.merge(frequencies, left_on='Name', right_on='Name', how='outer')
+    organisations['Project Number'] = organisations['Project Number'].fillna(0)
+    return organisations
+
+
+#Finding number of projects and stage numbers
+def prepare_reports(raw_report, raw_organisations):
+    #Copied so cached inputs are left as they were loaded
+    implementation_report=raw_report.copy()
+    organisations = count_projects(implementation_report, raw_organisations)
+    organisations.replace({'STP: ':'ICS: '},regex=True,inplace=True)
+    implementation_report.replace({'STP: ':'ICS: '},regex=True,inplace=True)
+    implementation_report[['Interest','Stage']]=implementation_report[['Interest','Stage']].fillna('Not Available')
+
+    #Filtering by project
+    implementation_report['Stage Number']=(implementation_report['Stage'].str.extract('(\d+)')).fillna(0)
+    implementation_report['Stage Number'] = pd.to_numeric(implementation_report['Stage Number'])
+    #Creates a stage 3.1, Decision No
+    project_stage = np.where(implementation_report['Stage Number'] > 3, implementation_report['Stage Number'] + 1, implementation_report['Stage Number'])
+    decision_yes = implementation_report['Interest'].str.contains(' Yes - ', regex=False, na=False).to_numpy()
+    implementation_report['Project View Stage Number'] = np.where(decision_yes & (project_stage == 3), 4, project_stage)
+    return implementation_report, organisations
+
+
+def apply_variant(implementation_report, organisation_counts, exclude=None, redact=None):
+
+    '''
+    Narrows the prepared report to what one output variant may show, so every variant is built from the same loaded frames.\n
+    exclude - Dict of column -> values, report rows with any of the values are dropped (and no longer counted for their organisation).\n
+    redact - Dict of column -> text shown in place of every value of the column.
+    '''
+
+    if not exclude and not redact:
+        return implementation_report, organisation_counts
+    excluded = np.zeros(len(implementation_report), dtype=bool)
+    for column, values in (exclude or {}).items():
+        excluded |= implementation_report[column].isin(values).to_numpy()
+    implementation_report = implementation_report[~excluded].reset_index(drop=True)
+    for column, text in (redact or {}).items():
+        implementation_report[column] = text
+    if excluded.any():
+        organisation_counts = count_projects(implementation_report, organisation_counts.drop(columns='Project Number'))
+    return implementation_report, organisation_counts
+
+
+def prepare_projects(implementation_report, organisation_counts):
+    #Adding column for project list with line break formatting
+    projects=project_lists(organisation_counts, implementation_report)
+    organisations=organisation_counts.merge(projects,left_on='Name',right_index=True)
+
+    #Find which organisations are involved in each project, the project view slices one trace per project from it
+    project_names = sorted(set(implementation_report['ProjectName']))
+    membership=organisation_projects(organisations, implementation_report)
+    return organisations, project_names, membership
+
+
+#Generating dataframes for STPs/ICSs + cleaning data
+def prepare_stps(stps_shapes, ics_locations, organisations):
+    stps=stps_shapes.copy()
+    stps.replace(ICS_NAMES,inplace=True)
+    stps=stps[stps['STP21NM'].isin(ics_locations['Name'])]
+    stps_pd = pd.DataFrame(stps.drop(columns='geometry'))
+    stps_pd.rename(columns={"STP21NM": "Name"},inplace=True)
+    stps_pd = stps_pd.merge(organisations[['Name','Project Number']].drop_duplicates('Name'), left_on='Name', right_on='Name')
+    stps_pd = stps_pd.merge(ics_locations[['Name','Longitude','Latitude']], left_on='Name', right_on='Name')
+    stps_pd=stps_pd.merge(pd.get_dummies(stps_pd['Name']),left_index=True, right_index=True)
+    stps_pd=stps_pd.merge(organisations[['Name','Projects']].drop_duplicates('Name'),left_on='Name',right_on='Name')
+    return stps, stps_pd
+
+
+#Demographics of each LSOA with a shape, keeping the shapefile's index which the LSOA trace uses as feature ids
+def prepare_lsoa(lsoa, lsoa_table):
+    return lsoa[['LSOA11CD']].join(lsoa_table, on='LSOA11CD', how='inner')
+
+
+#Generating dataframes for LAs
+def prepare_authority(authority, authority_table):
+    authority_pd = authority[['LAD21CD','LAD21NM']].join(authority_table, on='LAD21CD', how='inner')
+    authority_pd=authority_pd[authority_pd['LAD21CD'].str.startswith('E09')==False]
+    areas_to_drop=['South Oxfordshire','Oadby and Wigston','Harborough','Melton','Rutland']
+    authority_pd=authority_pd[~authority_pd['LAD21NM'].str.contains('|'.join(areas_to_drop))]
+    return authority_pd
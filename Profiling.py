@@ -0,0 +1,106 @@
+import os, csv, json, time, pstats, cProfile, resource, platform
+
+
+#Peak resident memory of the whole process so far in MB (ru_maxrss is in KB on Linux, bytes on macOS)
+def peak_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if platform.system() == 'Darwin' else rss / 1024
+
+
+#Rows and in-memory bytes of the frames in a value, looking inside tuples, lists and dicts of frames
+def frame_sizes(value):
+    #Only frames from stages that have run are measured, so pandas is already loaded
+    import pandas as pd
+    if isinstance(value, pd.DataFrame):
+        return len(value), int(value.memory_usage(index=False).sum())
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, (tuple, list)):
+        sizes = [frame_sizes(item) for item in value]
+        return sum(rows for rows, _ in sizes), sum(size for _, size in sizes)
+    return 0, 0
+
+
+def profile_call(name, func, kwargs, pstats_path=None):
+
+    '''
+    Calls a stage and measures it in the thread or process it runs in.\n
+    pstats_path - Also runs the stage under cProfile and dumps the stats to this file.\n
+    Returns the stage's result and a record of its wall time, CPU time, rise in the process's peak memory, rows and
+    bytes of the frames it read and returned, and the size of each trace and fragment it wrote.\n
+    The peak memory is the high-water mark of the whole process (ru_maxrss). It's only the stage's own when no other stage
+    runs in the same process at the time, e.g. with --workers 1. See mark_shared_memory.
+    '''
+
+    import Bundle
+    rows_in, bytes_in = frame_sizes(kwargs)
+    rss_before = peak_rss()
+    Bundle.written.entries = []
+    profiler = cProfile.Profile() if pstats_path else None
+    started, wall, cpu = time.time(), time.perf_counter(), time.thread_time()
+    try:
+        result = profiler.runcall(func, **kwargs) if profiler else func(**kwargs)
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+        outputs, Bundle.written.entries = Bundle.written.entries, None
+    if profiler:
+        profiler.dump_stats(pstats_path)
+    rows_out, bytes_out = frame_sizes(result)
+    return result, {'stage': name, 'pid': os.getpid(), 'started': started, 'wall_seconds': round(wall, 4),
+                    'cpu_seconds': round(cpu, 4), 'process_peak_rss_mb': round(peak_rss(), 1),
+                    'process_peak_rss_increase_mb': round(peak_rss() - rss_before, 1),
+                    'rows_in': rows_in, 'bytes_in': bytes_in, 'rows_out': rows_out, 'bytes_out': bytes_out,
+                    'output_bytes': sum(entry['bytes'] for entry in outputs), 'outputs': outputs}
+
+
+def mark_shared_memory(records):
+
+    '''
+    Sets memory_shared on each record whose stage overlapped another stage running in the same process, as its peak
+    memory figures then include what the other stages allocated.
+    '''
+
+    for record in records:
+        end = record['started'] + record['wall_seconds']
+        record['memory_shared'] = any(other is not record and other['pid'] == record['pid'] and other['started'] < end
+                                      and record['started'] < other['started'] + other['wall_seconds'] for other in records)
+    return records
+
+
+def write_report(records, path):
+
+    '''
+    Writes the stage records of a run as JSON, or as CSV if path ends with .csv.\n
+    The CSV report has one row per stage, with the size of each trace and fragment in a second {name}_outputs.csv file.
+    '''
+
+    mark_shared_memory(records)
+    start = min((record['started'] for record in records), default=0)
+    for record in records:
+        record['start_offset_seconds'] = round(record['started'] - start, 4)
+    if not path.endswith('.csv'):
+        with open(path, 'w') as file:
+            json.dump({'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(start)), 'stages': records}, file, indent=2)
+        return
+    columns = [column for column in records[0] if column != 'outputs'] if records else []
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, columns, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(records)
+    with open(path.replace('.csv', '_outputs.csv'), 'w', newline='') as file:
+        writer = csv.DictWriter(file, ['stage', 'file', 'trace', 'type', 'name', 'bytes'], extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(dict(entry, stage=record['stage']) for record in records for entry in record['outputs'])
+
+
+#Peak memory rises marked * overlapped other stages in the same process, so aren't the stage's own
+def print_summary(records, pstats_path=None):
+    mark_shared_memory(records)
+    for record in sorted(records, key=lambda record: -record['wall_seconds']):
+        print(f"{record['stage']:<28}{record['wall_seconds']:>9.3f}s wall{record['cpu_seconds']:>9.3f}s cpu"
+              f"{record['process_peak_rss_increase_mb']:>+9.1f}MB{'*' if record['memory_shared'] else ' '}"
+              f"{record['rows_out']:>10} rows{record['output_bytes']:>12} bytes written")
+    if any(record['memory_shared'] for record in records):
+        print('* process-wide peak memory, shared with stages running at the same time (run with --workers 1 for per-stage figures)')
+    if pstats_path and os.path.exists(pstats_path):
+        pstats.Stats(pstats_path).sort_stats('cumulative').print_stats(20)
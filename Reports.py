@@ -0,0 +1,170 @@
+import os, csv, json, hashlib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+
+#Columns the views read from each portfolio report, added empty when a report doesn't have them. Any other columns are
+#kept as they are
+REPORT_SCHEMA = pa.schema([('Name', pa.string()), ('ProjectName', pa.string()), ('Stage', pa.string()),
+                           ('Interest', pa.string()), ('WhyImportant', pa.string())])
+#Rows without these are rejected
+REQUIRED_COLUMNS = ['Name', 'ProjectName']
+#Bytes parsed at a time, so very large exports are never held in memory as a whole
+BLOCK_SIZE = 1 << 22
+
+
+def report_columns(filepath):
+    with open(filepath, 'r', encoding='utf-8-sig', newline='') as file:
+        return next(csv.reader(file), [])
+
+
+def read_portfolio(filepath, portfolio, rejected=None, block_size=BLOCK_SIZE):
+
+    '''
+    Reads a single portfolio report in blocks with the pyarrow parser and normalises it for the combined report.\n
+    Every column is read as text, so each block is parsed the same way whatever values it holds. Rows with the wrong
+    number of fields or without a Name or ProjectName are skipped and appended to rejected. Duplicate rows (across all
+    columns) are dropped by comparing a 64-bit hash of each row against the hashes of the rows already kept.
+    '''
+
+    rejected = [] if rejected is None else rejected
+    header = report_columns(filepath)
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f'{filepath} has no {", ".join(missing)} column')
+    columns = list(dict.fromkeys(header + REPORT_SCHEMA.names))
+
+    def invalid_row(row):
+        rejected.append(dict(portfolio=portfolio, line=row.number, reason=f'{row.actual_columns} fields instead of {row.expected_columns}', text=row.text))
+        return 'skip'
+
+    reader = pv.open_csv(filepath, read_options=pv.ReadOptions(block_size=block_size),
+                         parse_options=pv.ParseOptions(newlines_in_values=True, invalid_row_handler=invalid_row),
+                         convert_options=pv.ConvertOptions(column_types={column: pa.string() for column in columns}, include_columns=columns,
+                                                           include_missing_columns=True, strings_can_be_null=True))
+    frames, seen = [], np.empty(0, dtype='uint64')
+    for batch in reader:
+        df = batch.to_pandas()
+        invalid = df[REQUIRED_COLUMNS].isna().any(axis=1) | df[REQUIRED_COLUMNS].apply(lambda column: column.str.strip() == '').any(axis=1)
+        for row in df[invalid].itertuples(index=False):
+            rejected.append(dict(portfolio=portfolio, line=None, reason='missing Name or ProjectName', text=','.join('' if pd.isna(value) else str(value) for value in row)))
+        df = df[~invalid]
+        #Rows from different portfolios can never be duplicates, so deduplicating each report is enough
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        keep = ~pd.Series(hashes).duplicated().to_numpy() & ~np.isin(hashes, seen)
+        seen = np.concatenate([seen, hashes[keep]])
+        frames.append(df[keep])
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({column: pd.Series(dtype=object) for column in columns})
+    df['Portfolio'] = portfolio
+    df['ProjectName'] = portfolio + ' - ' + df['ProjectName']
+    return df
+
+
+def save_rejected(path, rejected):
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, ['portfolio', 'line', 'reason', 'text'])
+        writer.writeheader()
+        writer.writerows(rejected)
+
+
+#Hashes file contents in blocks so large exports aren't held in memory twice
+def file_hash(filepath, block_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+#Version of the report reader (this module and pyarrow), reports cached by another version are read again
+def reader_version():
+    digest = hashlib.blake2b(pa.__version__.encode(), digest_size=16)
+    with open(os.path.abspath(__file__), 'rb') as file:
+        digest.update(file.read())
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as file:
+        return json.load(file)
+
+
+def save_manifest(manifest_path, manifest):
+    with open(manifest_path, 'w') as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+
+def update_combined_report(path_to_data, config):
+
+    '''
+    Rebuilds the combined implementation report from the portfolio reports, re-parsing only reports that were added, changed or removed.\n
+    Each report's path, size, mtime, content hash, number of malformed rows and the reader version are kept in a manifest
+    alongside a cached, normalised frame of the report (and a .rejected.csv of its malformed rows).\n
+    Returns True if the combined report was rewritten.
+    '''
+
+    reports_dir = f"{path_to_data}/{config['files']['individual_reports']}"
+    cache_dir = f"{path_to_data}/{config['files']['report_cache']}"
+    combined_report = f"{path_to_data}/{config['files']['implementation_report']}"
+
+    filenames = sorted(filename for filename in os.listdir(reports_dir) if filename.endswith('.csv'))
+    if not filenames:
+        return False
+
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = f'{cache_dir}/manifest.json'
+    manifest = load_manifest(manifest_path)
+    updated_manifest = {}
+    reader = reader_version()
+
+    #Removed reports also require the combined report to be rebuilt
+    changed = set(manifest) - set(filenames)
+    for filename in changed:
+        cached = f"{cache_dir}/{manifest[filename]['cache']}"
+        for path in (cached, cached.replace('.feather', '.rejected.csv')):
+            if os.path.exists(path):
+                os.remove(path)
+
+    for filename in filenames:
+        filepath = f'{reports_dir}/{filename}'
+        portfolio = filename.replace('.csv', '')
+        cached = f'{cache_dir}/{portfolio}.feather'
+        stat = os.stat(filepath)
+        entry = manifest.get(filename)
+        cache_valid = entry is not None and entry.get('reader') == reader and os.path.exists(cached)
+
+        #Unchanged size and mtime means the report doesn't need to be read at all
+        if cache_valid and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            updated_manifest[filename] = entry
+            continue
+
+        #Only re-parse when the contents have actually changed (e.g. not just re-downloaded)
+        digest = file_hash(filepath)
+        rejected = entry.get('rejected', 0) if cache_valid else 0
+        if not (cache_valid and entry['hash'] == digest):
+            rows = []
+            read_portfolio(filepath, portfolio, rows).to_feather(cached)
+            #Malformed rows of each report are listed next to its cached copy
+            if rows:
+                save_rejected(f'{cache_dir}/{portfolio}.rejected.csv', rows)
+                print(f'{filename}: {len(rows)} malformed rows were skipped, see {cache_dir}/{portfolio}.rejected.csv')
+            elif os.path.exists(f'{cache_dir}/{portfolio}.rejected.csv'):
+                os.remove(f'{cache_dir}/{portfolio}.rejected.csv')
+            rejected = len(rows)
+            changed.add(filename)
+        updated_manifest[filename] = dict(path=filepath, size=stat.st_size, mtime=stat.st_mtime_ns,
+                                          hash=digest, cache=f'{portfolio}.feather', rejected=rejected, reader=reader)
+
+    if changed or not os.path.exists(combined_report):
+        df = pd.concat([pd.read_feather(f"{cache_dir}/{updated_manifest[filename]['cache']}") for filename in filenames],
+                       ignore_index=True)
+        df.to_csv(combined_report, index=False)
+        save_manifest(manifest_path, updated_manifest)
+        return True
+
+    if updated_manifest != manifest:
+        save_manifest(manifest_path, updated_manifest)
+    return False
@@ -0,0 +1,151 @@
+import os, re, email.utils
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+#Precompressed copies written next to each file (see Bundle.precompress), in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+#Content-hashed files never change, so browsers can keep them without revalidating. Only the names fingerprinted by the
+#build match: Bundle.hashed_name's 12 hex digits (e.g. plotly.min.aa1d78498a3b.js) and the theme's bundles (e.g.
+#assets/javascripts/bundle.d7400e89.min.js), not other names with digits in them such as report.20231015.html
+HASHED = [re.compile(r'\.[0-9a-f]{12}\.(html|js|json)$'),
+          re.compile(r'^assets/(javascripts|stylesheets)/\w+\.[0-9a-f]{8}\.min\.(js|css)(\.map)?$')]
+IMMUTABLE = 'public, max-age=31536000, immutable'
+#Other files (the docs pages, assets.json) are kept but revalidated with their ETag on every use
+REVALIDATE = 'no-cache'
+
+
+#Codings the client accepts (q > 0) from an Accept-Encoding header
+def accepted_encodings(header):
+    accepted = set()
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = re.search(r'q=([0-9.]+)', params)
+        if coding and (quality is None or float(quality.group(1)) > 0):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+#Whether a file of the site (path relative to its root) is content-hashed
+def is_hashed(path):
+    path = path.replace(os.sep, '/')
+    return any(pattern.search(path) for pattern in HASHED)
+
+
+class SiteHandler(SimpleHTTPRequestHandler):
+
+    '''
+    Serves a static site built by mkdocs build.\n
+    Each response has an ETag and Last-Modified, and conditional requests are answered with 304 Not Modified. Files with
+    a .br or .gz copy are sent compressed to clients that accept it, and content-hashed files are marked immutable.
+    '''
+
+    #Keeps connections open between requests, so a page and its assets load over one connection
+    protocol_version = 'HTTP/1.1'
+    #Sends the headers straight away, otherwise small responses on a kept-alive connection wait ~40ms for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def __init__(self, *args, quiet=False, **kwargs):
+        self.quiet = quiet
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    #The file sent for path and its Content-Encoding, the best precompressed copy the client accepts
+    def negotiate(self, path):
+        accepted = accepted_encodings(self.headers.get('Accept-Encoding'))
+        for encoding, ext in ENCODINGS:
+            if encoding in accepted and os.path.isfile(path + ext):
+                return path + ext, encoding
+        return path, None
+
+    def not_modified(self, etag, modified):
+        if 'If-None-Match' in self.headers:
+            tags = [tag.strip().removeprefix('W/') for tag in self.headers['If-None-Match'].split(',')]
+            return etag in tags or '*' in tags
+        if 'If-Modified-Since' in self.headers:
+            try:
+                since = email.utils.parsedate_to_datetime(self.headers['If-Modified-Since']).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(modified) <= since
+        return False
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            #Redirects to the trailing slash, or falls through to the index page
+            if not self.path.split('?', 1)[0].split('#', 1)[0].endswith('/'):
+                return super().send_head()
+            path = os.path.join(path, 'index.html')
+        if not os.path.isfile(path) or path.endswith(tuple(ext for _, ext in ENCODINGS)):
+            return self.send_not_found()
+        served, encoding = self.negotiate(path)
+        #Each encoding has its own ETag, but they share the file's Last-Modified
+        stat, modified = os.stat(served), os.path.getmtime(path)
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+        compressible = any(os.path.isfile(path + ext) for _, ext in ENCODINGS)
+        headers = {'ETag': etag, 'Last-Modified': self.date_time_string(int(modified)),
+                   'Cache-Control': IMMUTABLE if is_hashed(os.path.relpath(path, self.directory)) else REVALIDATE}
+        if compressible:
+            headers['Vary'] = 'Accept-Encoding'
+        if self.not_modified(etag, modified):
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return None
+        file = open(served, 'rb')
+        self.send_response(200)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Length', str(stat.st_size))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        return file
+
+    #The site's 404.html (written by mkdocs) when there is one
+    def send_not_found(self):
+        page = os.path.join(self.directory, '404.html')
+        if not os.path.isfile(page):
+            self.send_error(404, 'File not found')
+            return None
+        file = open(page, 'rb')
+        self.send_response(404)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(os.path.getsize(page)))
+        self.send_header('Cache-Control', REVALIDATE)
+        self.end_headers()
+        return file
+
+
+class SiteServer(ThreadingHTTPServer):
+    daemon_threads = True
+    #Room for many dashboard users connecting at once
+    request_queue_size = 256
+
+
+def make_server(directory, host='127.0.0.1', port=8000, quiet=False):
+    return SiteServer((host, port), partial(SiteHandler, directory=directory, quiet=quiet))
+
+
+def serve_site(directory, host='127.0.0.1', port=8000, quiet=False):
+
+    '''
+    Serves a built site until interrupted, with a thread per connection.\n
+    directory - Folder written by mkdocs build.\n
+    host, port - Address to listen on, use host 0.0.0.0 to serve other machines.\n
+    quiet - Don't log each request.
+    '''
+
+    server = make_server(directory, host, port, quiet)
+    print(f'Serving {directory} at http://{host}:{server.server_address[1]}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
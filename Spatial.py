@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+#Geometry traces of the overall view that projects are aggregated onto
+AREA_TRACES = ('LSOA', 'LA', 'ICSs')
+STAGES = range(8)
+
+
+def build_indexes(lsoa, authority, stps_shapes):
+
+    '''
+    Builds an STRtree over the polygons of each area type, kept with the index labels of its shapefile.\n
+    A stage of its own, so the build cache keeps the trees until the shapefiles change, however often the organisations do.
+    '''
+
+    return {trace: (shapely.STRtree(np.asarray(areas.geometry.array)), areas.index)
+            for trace, areas in zip(AREA_TRACES, [lsoa, authority, stps_shapes])}
+
+
+#Label of the area containing each point, None for points outside every area (or without coordinates)
+def locate_points(index, latitude, longitude):
+    tree, labels = index
+    points = shapely.points(np.asarray(longitude, dtype='float64'), np.asarray(latitude, dtype='float64'))
+    point, area = tree.query(points, predicate='intersects')
+    #A point on a shared border intersects both areas and is placed in the first
+    point, first = np.unique(point, return_index=True)
+    located = np.full(len(points), None, dtype='object')
+    located[point] = labels[area[first]]
+    return located
+
+
+def aggregate_projects(organisations, implementation_report, area_index):
+
+    '''
+    Places each organisation in its LSOA, LA and ICS with one bulk point-in-polygon query per area type, then counts
+    the projects and organisations in each area and the report rows at each stage.\n
+    Returns a frame per geometry trace indexed by the area's label in its shapefile, holding only areas with a project.
+    '''
+
+    located = organisations[['Name', 'Latitude', 'Longitude']].drop_duplicates('Name')
+    rows = implementation_report[['Name', 'ProjectName', 'Stage Number']]
+    areas = {}
+    for trace in AREA_TRACES:
+        located = located.assign(Area=locate_points(area_index[trace], located['Latitude'], located['Longitude']))
+        report = rows.merge(located[['Name', 'Area']].dropna(), on='Name')
+        grouped = report.groupby('Area')
+        stages = report.groupby(['Area', 'Stage Number']).size().unstack(fill_value=0).reindex(columns=STAGES, fill_value=0)
+        #Stage distribution as hover text, e.g. 'Stage 1: 3<br>Stage 4: 1'
+        distribution = pd.Series('', index=stages.index)
+        for stage in STAGES:
+            distribution += np.where(stages[stage] > 0, f'<br>Stage {stage}: ' + stages[stage].astype(str), '')
+        areas[trace] = pd.DataFrame({'Projects in area': grouped['ProjectName'].nunique(),
+                                     'Organisations in area': grouped['Name'].nunique(),
+                                     'Project stages': distribution.str.removeprefix('<br>')})
+    return areas
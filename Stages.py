@@ -0,0 +1,186 @@
+import importlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from Profiling import profile_call
+from BuildCache import value_fingerprint
+
+
+class Stage(object):
+
+    '''
+    A named step of the pipeline.\n
+    func - Called with the stage's inputs and any extra keyword arguments. Can be given as 'Module:function', so the
+    module (and anything heavy it imports) is only imported once the stage runs.\n
+    inputs - Names of the values the stage reads, passed to func as keyword arguments. Can be a dict of argument name ->
+    value name, when a value is passed under another name (e.g. the frames of one output variant).\n
+    outputs - Names given to the values func returns, a single name or a tuple matched to a returned tuple.\n
+    after - Names of values that must exist before the stage runs but aren't passed to it (e.g. a file being written).\n
+    cpu_bound - Run the stage in a process pool when processes are enabled, rather than a thread.\n
+    cache - Keep the stage's outputs in the build cache, so it only runs again when its fingerprint changes.\n
+    reads - Files the stage reads (or a function returning them), their size and mtime are part of its fingerprint.\n
+    config_keys - Sections of the config the stage uses, only these are part of its fingerprint (all of it if empty).\n
+    valid - Called before reusing a cached entry, returning False when something the stage wrote has since gone.
+    '''
+
+    def __init__(self, name, func, inputs=(), outputs=(), after=(), cpu_bound=False, cache=True, reads=(), config_keys=(),
+                 valid=None, **kwargs):
+        self.name = name
+        self.func = func
+        self.names = dict(inputs) if isinstance(inputs, dict) else {name: name for name in inputs}
+        self.inputs = tuple(self.names.values())
+        self.outputs = (outputs,) if isinstance(outputs, str) else tuple(outputs)
+        self.after = tuple(after)
+        self.cpu_bound = cpu_bound
+        self.cache = cache
+        self.reads = reads if callable(reads) else tuple(reads)
+        self.config_keys = tuple(config_keys)
+        self.valid = valid
+        self.kwargs = kwargs
+
+    def arguments(self, values):
+        return dict(self.kwargs, **{argument: values[name] for argument, name in self.names.items()})
+
+    def store(self, values, result):
+        if len(self.outputs) == 1:
+            values[self.outputs[0]] = result
+        elif self.outputs:
+            values.update(zip(self.outputs, result))
+
+
+def resolve(func):
+    if isinstance(func, str):
+        module, name = func.split(':')
+        return getattr(importlib.import_module(module), name)
+    return func
+
+
+#Only the stages needed to produce the given values
+def select_stages(stages, outputs):
+    producers = {output: stage for stage in stages for output in stage.outputs}
+    needed, names = set(), list(outputs)
+    while names:
+        stage = producers[names.pop()]
+        if stage not in needed:
+            needed.add(stage)
+            names += stage.inputs + stage.after
+    return [stage for stage in stages if stage in needed]
+
+
+#Module level so it can be sent to a process pool
+def call_stage(func, kwargs):
+    return func(**kwargs)
+
+
+#The function and arguments that run a stage, profiling it when records is a list
+def stage_call(stage, values, records, profile_stage, pstats_path, cache):
+    kwargs = stage.arguments(values)
+    if cache is not None:
+        kwargs = {name: cache.resolve(value) for name, value in kwargs.items()}
+    if records is None:
+        return call_stage, resolve(stage.func), kwargs
+    return profile_call, stage.name, resolve(stage.func), kwargs, pstats_path if stage.name == profile_stage else None
+
+
+#Stores what a stage returned, along with its profiling record and build cache entry
+def finish(stage, values, records, result, cache, fingerprints):
+    if records is not None:
+        result, record = result
+        records.append(record)
+    stage.store(values, result)
+    if cache is None:
+        return
+    if stage.cache:
+        cache.store(stage, fingerprints[stage], values)
+        fingerprints.update({output: f'{fingerprints[stage]}:{output}' for output in stage.outputs})
+    else:
+        fingerprints.update({output: value_fingerprint(values[output]) for output in stage.outputs})
+
+
+#Stores placeholders for the outputs of a stage whose build cache entry is current, returning True if it needn't run
+def reuse(stage, values, cache, fingerprints):
+    if cache is None or not stage.cache:
+        return False
+    fingerprint = fingerprints[stage] = cache.fingerprint(stage, fingerprints)
+    cached = cache.lookup(stage, fingerprint)
+    if cached is None:
+        return False
+    values.update(zip(stage.outputs, cached))
+    fingerprints.update({output: f'{fingerprint}:{output}' for output in stage.outputs})
+    return True
+
+
+def check_stages(stages, values):
+    produced = set(values)
+    for stage in stages:
+        for output in stage.outputs:
+            if output in produced:
+                raise ValueError(f"'{output}' is produced by more than one stage")
+            produced.add(output)
+    for stage in stages:
+        missing = [name for name in stage.inputs + stage.after if name not in produced]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' needs {missing}, which no stage produces")
+
+
+def run_pipeline(stages, values=None, workers=1, processes=False, records=None, profile_stage=None, pstats_path=None, cache=None):
+
+    '''
+    Runs each stage as soon as all of its inputs exist, so independent stages run concurrently.\n
+    values - Values available before any stage runs.\n
+    workers - Maximum number of stages running at once, 1 runs the stages one after another in dependency order.\n
+    processes - Run cpu_bound stages in a process pool (other stages always run in threads).\n
+    records - A list to append a profiling record of each stage to, stages aren't profiled if None.\n
+    profile_stage, pstats_path - Name of a stage to also run under cProfile, and the file its stats are dumped to.\n
+    cache - A BuildCache, stages whose fingerprint is unchanged are skipped and only the cached outputs needed by stages that run are read.\n
+    Returns a dict of every value produced.
+    '''
+
+    values = dict(values or {})
+    check_stages(stages, values)
+    #Fingerprints of each value by name and of each stage
+    fingerprints = {name: value_fingerprint(value) for name, value in values.items()} if cache is not None else {}
+    pending = list(stages)
+
+    def ready():
+        return [stage for stage in pending if all(name in values for name in stage.inputs + stage.after)]
+
+    if workers == 1:
+        while pending:
+            stages_ready = ready()
+            if not stages_ready:
+                raise RuntimeError(f"Stages {[stage.name for stage in pending]} depend on each other")
+            stage = stages_ready[0]
+            pending.remove(stage)
+            if reuse(stage, values, cache, fingerprints):
+                continue
+            func, *args = stage_call(stage, values, records, profile_stage, pstats_path, cache)
+            finish(stage, values, records, func(*args), cache, fingerprints)
+        return values
+
+    running, forked = {}, False
+    with ThreadPoolExecutor(max_workers=workers) as threads, \
+         ProcessPoolExecutor(max_workers=workers) if processes else ThreadPoolExecutor(max_workers=workers) as cpu_pool:
+        while pending or running:
+            #Reusing a cached stage can make further stages ready straight away
+            stages_ready = ready()
+            while stages_ready:
+                for stage in stages_ready:
+                    pending.remove(stage)
+                    if reuse(stage, values, cache, fingerprints):
+                        continue
+                    pool = cpu_pool if stage.cpu_bound else threads
+                    #The worker processes are forked on the first submit. A worker forked while a loading thread is importing
+                    #a module would copy its import lock and hang on its first import, so the running threads finish first
+                    if processes and stage.cpu_bound and not forked:
+                        wait([future for future, running_stage in running.items() if not running_stage.cpu_bound])
+                        forked = True
+                    running[pool.submit(*stage_call(stage, values, records, profile_stage, pstats_path, cache))] = stage
+                stages_ready = ready()
+            if not running and not pending:
+                break
+            if not running:
+                raise RuntimeError(f"Stages {[stage.name for stage in pending]} depend on each other")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                finish(stage, values, records, future.result(), cache, fingerprints)
+    return values
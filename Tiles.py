@@ -0,0 +1,103 @@
+import os, json
+import numpy as np
+import shapely
+from Bundle import hashed_name, precompress, write_fragment, remove_unlisted, log_written
+from Geometry import load_geometry
+
+#Column used as the id of each feature in the tiles of a geometry file, the overall view's values are joined on it
+TILE_IDS = {'lsoas': 'LSOA11CD', 'local_authorities': 'LAD21CD'}
+#Web mercator stops at about 85.05 degrees
+MAX_LATITUDE = 85.0511
+
+
+#Columns and rows of the web mercator tiles at zoom covering each bounding box, as (x0, x1, y0, y1) arrays
+def tile_ranges(bounds, zoom):
+    n = 2 ** zoom
+    def column(lon):
+        return np.clip(np.floor((lon + 180) / 360 * n), 0, n - 1).astype('int64')
+    def row(lat):
+        lat = np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE))
+        return np.clip(np.floor((1 - np.arcsinh(np.tan(lat)) / np.pi) / 2 * n), 0, n - 1).astype('int64')
+    return column(bounds[:, 0]), column(bounds[:, 2]), row(bounds[:, 3]), row(bounds[:, 1])
+
+
+#Positions of the features whose bounding box overlaps each tile, keyed by (x, y)
+def tile_features(geometries, zoom):
+    x0, x1, y0, y1 = tile_ranges(shapely.bounds(geometries), zoom)
+    width = x1 - x0 + 1
+    counts = width * (y1 - y0 + 1)
+    #One row per feature and tile it overlaps
+    feature = np.repeat(np.arange(len(geometries)), counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    x = np.repeat(x0, counts) + offset % np.repeat(width, counts)
+    y = np.repeat(y0, counts) + offset // np.repeat(width, counts)
+    order = np.lexsort((feature, y, x))
+    keys = x[order] * 2 ** zoom + y[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype='int64')
+    return {(int(x[order][start]), int(y[order][start])): positions
+            for start, positions in zip(starts, np.split(feature[order], starts[1:]))}
+
+
+def write_tiles(path_to_data, config, outdirs, files=tuple(TILE_IDS), bbox=None):
+
+    '''
+    Writes a pyramid of GeoJSON tiles for each geometry file, so the overall view only fetches the areas in view.\n
+    Each zoom in config['geometry']['tiles']['zooms'] is tiled from its own level of the geometry cache. A feature is written
+    whole into every tile its bounding box overlaps, with its id column as the feature id. Tiles are content-hashed and
+    precompressed, and listed in a content-hashed index per file.\n
+    outdirs - Folders the tiles are written to (one per output variant), each gets the same tiles from a single pass.\n
+    bbox - Region the tiles cover, only features intersecting it are read (see Geometry.load_geometry).\n
+    Returns a dict of file -> name of its tile index.
+    '''
+
+    tiles_config = config['geometry']['tiles']
+    directories = [f"{outdir}/{tiles_config['directory']}" for outdir in outdirs]
+    indexes = {}
+    for file in files:
+        for directory in directories:
+            os.makedirs(f'{directory}/{file}', exist_ok=True)
+        index, written = {'directory': f"{tiles_config['directory']}/{file}", 'zooms': {}}, set()
+        for zoom, level in sorted(tiles_config['zooms'].items()):
+            df = load_geometry(path_to_data, config, file, level=level, columns=[TILE_IDS[file], 'geometry'], bbox=bbox)
+            geometries = np.asarray(df.geometry.array)
+            keep = ~(shapely.is_missing(geometries) | shapely.is_empty(geometries))
+            geometries = geometries[keep]
+            #Each feature is serialised once, then joined into every tile it overlaps
+            features = np.array([f'{{"type":"Feature","id":{json.dumps(str(code))},"geometry":{geometry}}}'
+                                 for code, geometry in zip(df[TILE_IDS[file]].to_numpy()[keep], shapely.to_geojson(geometries))], dtype='object')
+            tiles = {}
+            for (x, y), positions in tile_features(geometries, zoom).items():
+                data = ('{"type":"FeatureCollection","features":[' + ','.join(features[positions]) + ']}').encode()
+                name = hashed_name(f'{zoom}-{x}-{y}.json', data)
+                for directory in directories:
+                    if not os.path.exists(f'{directory}/{file}/{name}'):
+                        with open(f'{directory}/{file}/{name}', 'wb') as f:
+                            f.write(data)
+                    precompress(f'{directory}/{file}/{name}')
+                log_written(file=name, trace=None, type='tile', name=f'{file}/{zoom}', bytes=len(data))
+                tiles[f'{x}/{y}'] = name
+            index['zooms'][zoom] = tiles
+            written.update(tiles.values())
+        for directory in directories:
+            remove_unlisted(f'{directory}/{file}', written)
+            indexes[file] = write_fragment(directory, file, index)
+    for directory in directories:
+        remove_unlisted(directory, list(indexes.values()))
+        #Unhashed list of the current indexes, so later runs can check the tiles are still in place
+        with open(f'{directory}/tiles.json', 'w') as f:
+            json.dump(indexes, f, indent=2)
+    return indexes
+
+
+#Whether the tiles written by an earlier run are still in place in every folder
+def tiles_published(outdirs, config):
+    return all(tiles_present(f"{outdir}/{config['geometry']['tiles']['directory']}") for outdir in outdirs)
+
+
+def tiles_present(directory):
+    try:
+        with open(f'{directory}/tiles.json', 'r') as f:
+            indexes = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return False
+    return all(os.path.exists(f'{directory}/{index}') for index in indexes.values())
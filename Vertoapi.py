@@ -1,38 +1,279 @@
-import requests
+import os, json, hashlib, requests
 from http import HTTPStatus
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 import pandas as pd
 
 VERTO_API = 'https://www.vertocloud.com/eahsn/api/'
+VERTO_AUTH = ('API-USER', 'API-KEY')
 
 
-def get_entity(entity, describe=False):
-    r = requests.get(VERTO_API + entity, auth=('API-USER', 'API-KEY'))
-    sc = r.status_code
-    if HTTPStatus.OK != sc:
-        raise RuntimeError(f"Unsuccessful request, HTTP status code: {sc}")
-    data = r.json()
-    context = data['@odata.context']
-    df_entity = pd.DataFrame(data['value'])
-    if describe: describe_entity(entity, df_entity)
+#Builds the OData system query options so column/row filtering happens on the server
+def query_params(select=None, filter=None, top=None):
+    params = {}
+    if select:
+        params['$select'] = select if isinstance(select, str) else ','.join(select)
+    if filter:
+        params['$filter'] = filter
+    if top is not None:
+        params['$top'] = int(top)
+    return params
+
+
+#Builds one dataframe from a stream of pages, one page in memory at a time
+def frame_from_pages(pages, select=None, top=None):
+    context = None
+    frames = []
+    rows = 0
+    columns = None if select is None or isinstance(select, str) else list(select)
+    for page in pages:
+        if context is None:
+            context = page.get('@odata.context')
+        frames.append(pd.DataFrame(page['value'], columns=columns))
+        rows += len(page['value'])
+        if top is not None and rows >= top:
+            break
+    if frames:
+        df_entity = pd.concat(frames, ignore_index=True)
+    else:
+        df_entity = pd.DataFrame(columns=columns)
+    if top is not None:
+        df_entity = df_entity.head(top)
     return context, df_entity
 
 
+#On-disk parquet cache of entities, keyed by entity name and query
+class EntityCache(object):
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def key(self, entity, select=None, filter=None, top=None):
+        query = json.dumps(query_params(select, filter, top), sort_keys=True)
+        return f"{entity}-{hashlib.blake2b(query.encode(), digest_size=8).hexdigest()}"
+
+    def load(self, key):
+        if not (os.path.exists(f'{self.cache_dir}/{key}.parquet') and os.path.exists(f'{self.cache_dir}/{key}.json')):
+            return None, None
+        with open(f'{self.cache_dir}/{key}.json', 'r') as file:
+            meta = json.load(file)
+        return meta, pd.read_parquet(f'{self.cache_dir}/{key}.parquet')
+
+    def save(self, key, meta, df):
+        #Only created when something is cached, so clients that never sync leave no folder behind
+        os.makedirs(self.cache_dir, exist_ok=True)
+        df.reset_index(drop=True).to_parquet(f'{self.cache_dir}/{key}.parquet', index=False)
+        #Metadata is written last so a partly written table is never treated as valid
+        with open(f'{self.cache_dir}/{key}.json', 'w') as file:
+            json.dump(meta, file, indent=2)
+
+
+#Latest value of the modified column as the server wrote it, the next delta sync starts from it
+def watermark(df_entity, modified):
+    if not modified or modified not in df_entity.columns:
+        return None
+    timestamps = pd.to_datetime(df_entity[modified], utc=True, errors='coerce')
+    if timestamps.isna().all():
+        return None
+    return str(df_entity[modified].loc[timestamps.idxmax()])
+
+
+class VertoClient(object):
+
+    '''
+    OData client for the Verto API.\n
+    base_url - Root of the OData service.\n
+    auth - (user, key) tuple used for basic authentication.\n
+    pool_size - Number of pooled connections, also the default number of entities fetched at once.\n
+    page_size - Preferred number of rows per page (sent as odata.maxpagesize), None leaves it to the server.\n
+    cache_dir - Folder for the local entity cache used by sync_entity, None disables caching.\n
+    offline - Serve sync_entity purely from the cache without any network access.
+    '''
+
+    def __init__(self, base_url=VERTO_API, auth=VERTO_AUTH, pool_size=4, page_size=None, timeout=60, cache_dir=None, offline=False):
+        self.base_url = base_url
+        self.cache = EntityCache(cache_dir) if cache_dir else None
+        self.offline = offline
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = auth
+        self.session.headers.update({'Accept': 'application/json'})
+        if page_size:
+            self.session.headers.update({'Prefer': f'odata.maxpagesize={int(page_size)}'})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=3)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    #Returns the decoded page and response headers, or None for the page if the server replied 304 Not Modified
+    def get_page(self, url, params=None, headers=None):
+        if self.offline:
+            raise RuntimeError(f"Offline mode, refusing to request {url}")
+        r = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+        sc = r.status_code
+        if HTTPStatus.NOT_MODIFIED == sc:
+            return None, r.headers
+        if HTTPStatus.OK != sc:
+            raise RuntimeError(f"Unsuccessful request, HTTP status code: {sc}")
+        return r.json(), r.headers
+
+    #Yields each page of an entity, following @odata.nextLink until the server has no more rows
+    def iter_pages(self, entity, select=None, filter=None, top=None, first_page=None):
+        url = urljoin(self.base_url, entity)
+        #The next link already carries the query options, so they are only sent with the first request
+        params = query_params(select, filter, top)
+        data = first_page
+        if data is None:
+            data, _ = self.get_page(url, params)
+        while True:
+            yield data
+            next_link = data.get('@odata.nextLink')
+            if not next_link:
+                break
+            url = urljoin(url, next_link)
+            data, _ = self.get_page(url)
+
+    def get_entity(self, entity, describe=False, select=None, filter=None, top=None):
+        context, df_entity = frame_from_pages(self.iter_pages(entity, select, filter, top), select, top)
+        if describe: describe_entity(entity, df_entity)
+        return context, df_entity
+
+    def sync_entity(self, entity, key=None, modified=None, describe=False, select=None, filter=None, top=None, refresh=False):
+
+        '''
+        Returns an entity from the local cache, bringing the cache up to date with the server first.\n
+        key - Primary key column, used to merge changed rows into the cached table.\n
+        modified - Last modified timestamp column. With key set, only rows modified at or after the latest modified value in
+        the cache are downloaded, so the server's clock decides what has changed. Both are added to select if it leaves them out.\n
+        Without key/modified the cached ETag is sent as If-None-Match and the cached table is reused if the entity is unchanged.\n
+        refresh - Ignore the cache and download the whole entity again.\n
+        Rows deleted on the server are only dropped from the cache by a full refresh.
+        '''
+
+        if self.cache is None:
+            raise RuntimeError("sync_entity requires a cache_dir")
+        #The delta merge needs the key and modified columns of every row
+        if key and modified and select is not None:
+            columns = select.split(',') if isinstance(select, str) else list(select)
+            select = columns + [column for column in (key, modified) if column not in columns]
+        cache_key = self.cache.key(entity, select, filter, top)
+        meta, cached = (None, None) if refresh else self.cache.load(cache_key)
+
+        if self.offline:
+            if cached is None:
+                raise RuntimeError(f"{entity} is not in the local cache and offline mode is set")
+            if describe: describe_entity(entity, cached)
+            return meta['context'], cached
+
+        synced_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        url = urljoin(self.base_url, entity)
+
+        if cached is not None and key and modified and top is None and meta.get('watermark'):
+            #ge rather than gt, so rows committed with the same timestamp after the last sync aren't missed
+            delta = f"{modified} ge {meta['watermark']}"
+            delta_filter = f"({filter}) and {delta}" if filter else delta
+            context, changes = self.get_entity(entity, select=select, filter=delta_filter)
+            if len(changes):
+                df_entity = pd.concat([cached[~cached[key].isin(changes[key])], changes], ignore_index=True)
+            else:
+                df_entity = cached
+            etag = meta.get('etag')
+        else:
+            headers = {'If-None-Match': meta['etag']} if cached is not None and meta.get('etag') else None
+            first_page, response_headers = self.get_page(url, query_params(select, filter, top), headers)
+            if first_page is None:
+                context, df_entity, etag = meta['context'], cached, meta['etag']
+            else:
+                context, df_entity = frame_from_pages(self.iter_pages(entity, select, filter, top, first_page), select, top)
+                etag = response_headers.get('ETag')
+
+        self.cache.save(cache_key, dict(entity=entity, query=query_params(select, filter, top), context=context, etag=etag,
+                                        synced_at=synced_at, watermark=watermark(df_entity, modified), rows=len(df_entity)), df_entity)
+        if describe: describe_entity(entity, df_entity)
+        return context, df_entity
+
+    def get_entities(self, entities, max_workers=None, sync=False):
+
+        '''
+        Fetches several entities concurrently over the pooled session.\n
+        entities - Either a list of entity names or a dict of entity name -> query options (select, filter, top, and key/modified when syncing).\n
+        sync - Go through the local cache with sync_entity instead of downloading everything.\n
+        Returns a dict of entity name -> (context, dataframe).
+        '''
+
+        if not isinstance(entities, dict):
+            entities = {entity: {} for entity in entities}
+        fetch = self.sync_entity if sync else self.get_entity
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool_size) as pool:
+            futures = {entity: pool.submit(fetch, entity, **(query or {})) for entity, query in entities.items()}
+            return {entity: future.result() for entity, future in futures.items()}
+
+
+VERTO_CACHE = 'data/verto_cache'
+_client = None
+
+
+#Shared client so module level calls reuse one connection pool
+def default_client():
+    global _client
+    if _client is None:
+        _client = VertoClient(cache_dir=VERTO_CACHE)
+    return _client
+
+
+#Replaces the shared client, e.g. configure(offline=True) to work without network access
+def configure(**kwargs):
+    global _client
+    if _client is not None:
+        _client.close()
+    kwargs.setdefault('cache_dir', VERTO_CACHE)
+    _client = VertoClient(**kwargs)
+    return _client
+
+
+def get_entity(entity, describe=False, select=None, filter=None, top=None):
+    return default_client().get_entity(entity, describe, select=select, filter=filter, top=top)
+
+
+def sync_entity(entity, key=None, modified=None, describe=False, select=None, filter=None, top=None, refresh=False):
+    return default_client().sync_entity(entity, key, modified, describe, select=select, filter=filter, top=top, refresh=refresh)
+
+
+def get_entities(entities, max_workers=None, sync=False):
+    return default_client().get_entities(entities, max_workers, sync)
+
+
 def describe_entity(name, data):
     print(f'Columns of "{name}"')
     for col in data.columns:
         print(f"\t{col}")
 
 
-(ctx_project, df_project) = get_entity('Project')
-print(df_project[['ProjectID', 'ProjectCode','ProjectName']])
-
+if __name__ == "__main__":
 
-## get another data table
-#(ctx_ags, df_ags) = get_entity('ProjectExtended', True)
+    ## get several data tables at once, only downloading rows changed since the last run
+    entities = get_entities({
+        'Project': {'select': ['ProjectID', 'ProjectCode', 'ProjectName']},
+        'ProjectExtended': {},
+    }, sync=True)
+    (ctx_project, df_project) = entities['Project']
+    print(df_project[['ProjectID', 'ProjectCode','ProjectName']])
 
-## join the tables
-#joined = pd.merge(df_project, df_customer, on='ProjectID', how='outer', suffixes=('_prj', '_note'))
+    ## join the tables
+    #(ctx_ags, df_ags) = entities['ProjectExtended']
+    #joined = pd.merge(df_project, df_ags, on='ProjectID', how='outer', suffixes=('_prj', '_ext'))
 
-## Filter tables
-#is_pr = joined['ProjectCode']=='PR000098'
-#print(joined[is_pr][['ProjectID', 'ProjectCode','ProjectName',]])
+    ## Filter tables
+    #is_pr = joined['ProjectCode']=='PR000098'
+    #print(joined[is_pr][['ProjectID', 'ProjectCode','ProjectName',]])
@@ -0,0 +1,556 @@
+import os, string
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.express as px
+import numpy as np
+from Bundle import write_view, write_fragment, remove_unlisted, lazy_layers_script, package_site
+
+#Ignoring warning outputs
+pd.options.mode.chained_assignment = None  # default='warn'
+
+
+#Function to create a colour scale based on 
+def colorbar_discretize(colour,colour_indices):
+    n_cat=len(colour_indices)
+    colour_list=[]
+    colourscale=[]
+    n=0
+    for i in range(0,n_cat):
+            colour_list.append(colour[colour_indices[i]])
+            colourscale.append([i/n_cat,colour_list[i]])
+            colourscale.append([(i+1)/n_cat,colour_list[i]])
+    return(colourscale)
+
+#Only the columns a hovertemplate uses are sent as customdata, the templates refer to them by name e.g. '<b>{Name}</b>'
+def hover_fields(df, *templates):
+    columns=list(dict.fromkeys(field for template in templates for _, field, _, _ in string.Formatter().parse(template) if field))
+    fields={column:f'%{{customdata[{idx}]}}' for idx, column in enumerate(columns)}
+    #float32 measures are shown as their shortest decimal (e.g. 7.9), not as the float64 expansion of their value
+    customdata=df[columns].astype({column:str for column in columns if df[column].dtype=='float32'})
+    customdata=customdata.astype({column:'float64' for column in columns if df[column].dtype=='float32'})
+    return (customdata, *[template.format(**fields) for template in templates])
+
+#Inserts a line break every width characters, for all rows in one pass
+def wrap_text(series, width=50):
+    return series.fillna('').str.replace(f'(.{{{width}}})(?=.)', r'\1<br>', regex=True)
+
+#Sorts df by key and returns it with the start and end row of each name's rows, names without rows get an empty range.
+#Traces are sliced from one frame (and one customdata frame), rather than filtered from it once per name
+def trace_slices(df, key, names=None):
+    names = sorted(set(df[key])) if names is None else names
+    codes = pd.Categorical(df[key], categories=names).codes
+    order = np.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+    return df.iloc[order], list(zip(names, bounds[:-1], bounds[1:]))
+
+#Visibility of each trace for each distinct label, as boolean arrays indexed by trace
+def visibility_masks(labels):
+    codes, uniques = pd.factorize(pd.Series(labels), sort=True)
+    return dict(zip(uniques, codes == np.arange(len(uniques))[:, None]))
+
+#Traces of one type that share most of their properties. The shared properties are validated once and each trace's
+#own data is merged into a copy of them, which is much faster than plotly validating every trace of a large view
+def trace_dicts(trace_type, shared, traces):
+    template = trace_type(**shared).to_plotly_json()
+    return [{**template, **{key: {**template[key], **value} if isinstance(value, dict) and key in template else value
+                            for key, value in trace.items()}}
+            for trace in traces]
+
+#Adds the project counts of the areas in projects (from Spatial.aggregate_projects) to the areas of a trace, zero for areas without any
+def join_area_projects(df, projects, on=None):
+    df=df.join(projects, on=on)
+    counts=['Projects in area','Organisations in area']
+    df[counts]=df[counts].fillna(0).astype('int64')
+    df['Project stages']=df['Project stages'].fillna('')
+    return df
+
+def select_button(button_list):
+    button_list.insert(0,dict(label = 'Select...',
+        method = 'update',
+        args = [{'visible': False},
+                {'title': f'Please Select',
+                'showlegend':True}],
+        ))
+    return button_list
+
+#The organisation view as a figure dict, with a trace and a dropdown entry per organisation
+def organisation_figure(implementation_report, config):
+
+    organisations_config=config['organisation_view']
+
+    organisations_bar=go.Figure()
+
+    #Differentiating between Stage 3 Yes & No outcomes, with colours and wrapped text computed for all rows at once
+    project_ended=(implementation_report['Stage Number']==3) & implementation_report['Interest'].str.contains('Decision No', na=False)
+    implementation_report=implementation_report.assign(**{
+        'Project Ended?':np.where(project_ended,'Yes','No'),
+        'Color':np.where(project_ended,organisations_config['decision_no_color'],organisations_config['other_project_color']),
+        'WhyImportant':wrap_text(implementation_report['WhyImportant']),
+        })
+    report, organisations=trace_slices(implementation_report, 'Name')
+    customdata, hovertemplate = hover_fields(report, "<b>{Interest}</b><extra></extra>")
+
+    #Adds a bar trace and a button in the dropdown for each organisation
+    buttons_orgs=[]
+    visibility_orgs=visibility_masks([name for name, _, _ in organisations])
+    annotation=[
+            {   
+                "text": "Please select an organisation",
+                "xref": "paper",
+                "yref": "paper",
+                "showarrow": False,
+                "font": {
+                    "size": 28
+                }
+            }
+        ]
+    xaxis={
+        'tickmode':'array',
+        'tickvals':[0,1,2,3,4,5,6,7],
+        'ticktext':['0 - No Information','1 - Knowledge', '2 - Interest', '3 - Decision', '4 - Implementation', 
+                    '5 - Adoption', '6 - Spread<br><sup>(PSC Only)</sup>','7 - Sustained<br><sup>(PSC Only)</sup>'],
+        'range':[0,7],
+        'title':{'text':'Stage Number'}
+        }
+    organisations_traces=trace_dicts(go.Bar,
+            dict(visible=False,
+                showlegend=False,
+                orientation='h',
+                hovertemplate=hovertemplate,
+                ),
+            [dict(x=report['Stage Number'].to_numpy()[start:end],
+                y=report['ProjectName'].to_numpy()[start:end],
+                marker=dict(color=report['Color'].to_numpy()[start:end]),
+                customdata=customdata.to_numpy()[start:end],
+                ) for _, start, end in organisations])
+    for name, start, end in organisations:
+            #Creating dropdown, so it updates chart and title
+            buttons_orgs.append(dict(label = name,
+                method = 'update',
+                args = [{'visible': visibility_orgs[name]},
+                        {'title': f'{organisations_config["title_organisation"]} {name}{organisations_config["subheading"]}',
+                        'showlegend':True,
+                        'xaxis':xaxis,
+                        "annotations": []
+                        }
+                        ])
+            )
+    buttons_orgs.insert(0,dict(label = 'Select...',
+        method = 'update',
+        args = [{'visible': False},
+                {'title': f'Please Select',
+                'showlegend':True,
+                "annotations": annotation}],
+        ))
+    #Creating bar chart
+    organisations_bar.update_yaxes(
+        title_text='Project',
+    )
+    organisations_bar.update_layout(
+        title=dict(
+            yanchor="top", xanchor="left",
+            y=0.97, x=0.015,
+            text=f'{organisations_config["title_default"]} {organisations_config["subheading"]}'),
+        margin=dict(
+            t=80, b=10,
+            r=15, l=15,),
+        updatemenus=[
+            {"buttons": buttons_orgs,'x':organisations_config["button_pos_x"],'y':organisations_config["button_pos_y"],}],
+        annotations = annotation
+    )
+
+    return dict(organisations_bar.to_dict(), data=organisations_traces)
+
+
+def generate_organisation_view(implementation_report, config, outdir):
+    organisations_config=config['organisation_view']
+    #Outputting pioorgs.html file
+    write_view(organisation_figure(implementation_report, config), outdir, organisations_config["filename"])
+    print(f'{organisations_config["filename"]} was created')
+    return organisations_config['filename']
+
+
+#The project view as a figure dict, with a trace and a dropdown entry per project and a dropdown entry per portfolio
+def project_figure(project_names, membership, implementation_report, config):
+
+    projects_config=config['project_view']
+
+    project_fig = go.Figure()
+
+    #Creating scatter traces for each project, sliced from the membership table sorted by project
+    membership, projects=trace_slices(membership, 'ProjectName', project_names)
+    customdata, hovertemplate = hover_fields(membership, "<br>".join([
+                        "<b>{Name}</b><extra></extra>",
+                        "<br>{Interest}",
+                        ]))
+    colorscale=colorbar_discretize([getattr(px.colors.sequential,projects_config['colorbar'])[i] for i in [1,2,3,4,5,6,7,8]],
+                                   [0,1,2,3,4,5,6,7])
+    project_traces=trace_dicts(go.Scattermapbox,
+                        dict(hovertemplate=hovertemplate
+                        ,visible=False
+                        ,marker_size=15
+                        ,marker_colorscale=colorscale
+                        ,marker_cmin=0
+                        ,marker_cmax=7
+                        ,marker_showscale=True
+                        ,marker_colorbar_title_text='Stage Number'
+                        ,marker_colorbar_ticktext=[' 0 - No Information',' 1 - Knowledge', ' 2 - Interest', ' 3 - Decision: No',
+                                                    '3.1 - Decision:Yes', ' 4 - Implementation', ' 5 - Adoption', '<br> 6 - Spread<br><sup>(Only PSC)</sup>']
+                        ,marker_colorbar_tickvals=[0,1,2,3,4,5,6,7]
+                        ,showlegend=False
+                        ,opacity=projects_config['opacity']
+                        ),
+                        [dict(lat=membership['Latitude'].to_numpy()[start:end]
+                        ,lon=membership['Longitude'].to_numpy()[start:end]
+                        ,hovertext=membership['Name'].to_numpy()[start:end]
+                        ,customdata=customdata.to_numpy()[start:end]
+                        ,marker=dict(color=membership['Project View Stage Number'].to_numpy()[start:end])
+                        ,name=name
+                        ) for name, start, end in projects])
+
+    #Adding dropdown buttons for each project
+    visibility=visibility_masks(project_names)
+    buttons_projects=[]
+    for name in project_names:
+        buttons_projects.append(dict(label = name,
+        method = 'update',
+        args = [{'visible': visibility[name]},
+                {'title': f'{projects_config["title_project"]} {name}{projects_config["subheading"]}',
+                'showlegend':True}],
+        ))
+    select_button(buttons_projects)
+
+    #Matching each project to a portfolio
+    portfolios=implementation_report.drop_duplicates('ProjectName').set_index('ProjectName')['Portfolio'].reindex(project_names)
+    visibility_portfolios=visibility_masks(portfolios.to_numpy())
+
+    #Adding dropdown buttons for each portfolio
+    buttons_programmes=[]
+    for portfolio, visible in visibility_portfolios.items():
+            buttons_programmes.append(dict(label = portfolio,
+                    method = 'update',
+                    args = [{'visible': visible},
+                    {'title': f'{projects_config["title_portfolio"]} {portfolio} {projects_config["subheading"]}'}]
+                    ))
+    select_button(buttons_programmes)
+
+    #Creating project view map
+    project_fig.update_layout(
+        title=dict(
+            text=f'{projects_config["title_default"]}{projects_config["subheading"]}',
+            yanchor="top", xanchor="left",
+            y=0.98, x=0.001),
+        legend=dict(
+            yanchor="top", xanchor="left",
+            y=0.98, x=0.01,),
+        mapbox=dict(
+            style="open-street-map",
+            zoom=projects_config['zoom'],
+            center={"lat": 52.1951, "lon": 0.1313}),
+        updatemenus=[
+            {"buttons": buttons_projects,'x':projects_config["project_button"]["pos_x"],'y':projects_config["project_button"]["pos_y"]},
+            {"buttons": buttons_programmes,'x': projects_config["portfolio_button"]["pos_x"],'y':projects_config["portfolio_button"]["pos_y"]}],
+        margin=dict(
+            t=80, b=10,
+            r=10, l=10,),
+        hoverdistance=10,
+        )
+
+    return dict(project_fig.to_dict(), data=project_traces)
+
+
+def generate_project_view(project_names, membership, implementation_report, config, outdir):
+    projects_config=config['project_view']
+    write_view(project_figure(project_names, membership, implementation_report, config), outdir, projects_config["filename"])
+    print(f'{projects_config["filename"]} was created')
+    return projects_config['filename']
+
+
+def generate_overall_view(organisations, stps, stps_pd, lsoa_pd, authority_pd, area_projects, geometry_tiles, config, outdir):
+
+    overall_config=config['overall_view']
+
+    #Projects at the organisations located in each area. LSOA and LA frames share their shapefile's index, ICSs are matched by name
+    lsoa_pd=join_area_projects(lsoa_pd, area_projects['LSOA'])
+    authority_pd=join_area_projects(authority_pd, area_projects['LA'])
+    stps_pd=join_area_projects(stps_pd, area_projects['ICSs'].reindex(stps.index).set_axis(stps['STP21NM']), on='Name')
+
+    fig = go.Figure()
+
+    #Calculates the maximum number of projects an ICS has
+    max_ics = 0
+    for item in stps_pd['Project Number']:
+        if int(item) > max_ics:
+             max_ics = int(item)
+    if max_ics > 8:
+        max_ics = 8
+
+    ics_hovertemplate="<br>".join([
+            "<b>{Name}</b><extra></extra>",
+            "Project Number: {Project Number}<br>",
+            "{Projects}",
+            ])
+    organisations_customdata, organisations_hovertemplate = hover_fields(organisations, "<br>".join([
+            "<b>{Name}</b><extra></extra>",
+            "Project Number: {Project Number}<br>",
+            "{Projects}",
+            ]))
+
+    #The page starts with empty traces and fetches a trace's geometry the first time one of its layers is selected. LA and
+    #LSOA geometry is read from the tile pyramid (see Tiles.write_tiles) as the map moves, with features identified by area code
+    layer_traces=['LA','LSOA','ICSs']
+    trace_geometry={
+        'LA':dict(tiles=geometry_tiles['local_authorities'],locations=authority_pd['LAD21CD']),
+        'LSOA':dict(tiles=geometry_tiles['lsoas'],locations=lsoa_pd['LSOA11CD']),
+        'ICSs':dict(geojson=stps[['geometry']].__geo_interface__,locations=stps.index),
+    }
+    fig.add_trace(go.Choroplethmapbox(name='LA',visible=False))
+    fig.add_trace(go.Choroplethmapbox(name='LSOA',visible=False))
+    fig.add_trace(go.Choroplethmapbox(name='ICSs',visible=False))
+
+    #Styling for each descriptor, applied to its geometry trace by restyling when selected
+    layers={
+        'LA: Income deprivation rate quintile':dict(
+                    trace='LA',
+                    z=authority_pd['Income deprivation rate quintile'],
+                    marker_opacity=0.5,
+                    hovertemplate="<br>".join([
+                            "<b>{LAD21NM}</b><extra></extra>",
+                            "<br>IncDep Quintile: {Income deprivation rate quintile}",
+                            ]),
+                    colorscale=colorbar_discretize(getattr(px.colors.sequential,overall_config['colorbars']['la_imd']),[0,2,4,6,8]),
+                    colorbar_tickvals=[1,2,3,4,5],
+                    colorbar_ticktext=[' 1 - Most Deprived','2', '3',
+                                        '4', '5 - Least Deprived'],
+                    colorbar_tickmode = 'array',
+                    colorbar_title_text='IncDep Quintile',
+                    showscale=True),
+        'LA: BAME %':dict(
+                    trace='LA',
+                    z=authority_pd['BAME %'],
+                    marker_opacity=0.5,
+                    hovertemplate="<br>".join([
+                            "<b>{LAD21NM}</b><extra></extra>",
+                            "<br>% BAME: {BAME %}",
+                            ]),
+                    colorscale=getattr(px.colors.sequential,overall_config['colorbars']['la_bame']),
+                    colorbar_title_text='BAME %',
+                    showscale=True),
+        r'LA: % of all persons 65+':dict(
+                    trace='LA',
+                    z=authority_pd[r'% of all persons 65+'],
+                    marker_opacity=0.5,
+                    hovertemplate="<br>".join([
+                            "<b>{LAD21NM}</b><extra></extra>",
+                            "<br>Over 65 %: {% of all persons 65+}",
+                            ]),
+                    colorscale=getattr(px.colors.sequential,overall_config['colorbars']['la_age']),
+                    colorbar_title_text=r'% Over 65',
+                    showscale=True),
+        'LA: Projects':dict(
+                    trace='LA',
+                    z=authority_pd['Projects in area'],
+                    marker_opacity=0.5,
+                    hovertemplate="<br>".join([
+                            "<b>{LAD21NM}</b><extra></extra>",
+                            "<br>Projects: {Projects in area}",
+                            "Organisations: {Organisations in area}<br>",
+                            "{Project stages}",
+                            ]),
+                    colorscale=getattr(px.colors.sequential,overall_config['colorbars']['area_projects']),
+                    colorbar_title_text='No. of Projects in Area',
+                    showscale=True),
+        'LSOA: Index of multiple deprivation decile':dict(
+                    trace='LSOA',
+                    z=lsoa_pd['Index of multiple deprivation decile'],
+                    marker_opacity=0.3,
+                    hovertemplate="<br>".join([
+                            "<b>{lsoa11nm}</b><extra></extra>",
+                            "<br>IMD Decile: {Index of multiple deprivation decile}",
+                            ]),
+                    colorscale=colorbar_discretize(getattr(px.colors.sequential,overall_config['colorbars']['lsoa_imd'])+['rgb(255,255,255)'],[0,1,2,3,4,5,6,7,8,9]),
+                    colorbar_tickvals=[1,2,3,4,5,6,7,8,9,10],
+                    colorbar_ticktext=[' 1 - Most Deprived','2', '3',
+                                        '4', '5', '6','7','8','9','10 - Least Deprived'],
+                    colorbar_tickmode = 'array',
+                    colorbar_title_text='IMD Decile',
+                    showscale=True),
+        'LSOA: BAME %':dict(
+                    trace='LSOA',
+                    z=lsoa_pd['BAME %'],
+                    marker_opacity=0.3,
+                    hovertemplate="<br>".join([
+                            "<b>{lsoa11nm}</b><extra></extra>",
+                            "<br>% BAME: {BAME %}",
+                            ]),
+                    colorscale=overall_config['colorbars']['lsoa_bame'],
+                    colorbar_title_text='BAME %',
+                    showscale=True),
+        'LSOA: Age 65 and over':dict(
+                    trace='LSOA',
+                    z=lsoa_pd['Age 65 and over'],
+                    marker_opacity=0.3,
+                    hovertemplate="<br>".join([
+                            "<b>{lsoa11nm}</b><extra></extra>",
+                            "<br>Population over 65: {Age 65 and over}",
+                            ]),
+                    colorscale=overall_config['colorbars']['lsoa_age'],
+                    colorbar_title_text=r'% Over 65',
+                    showscale=True),
+        'LSOA: Projects':dict(
+                    trace='LSOA',
+                    z=lsoa_pd['Projects in area'],
+                    marker_opacity=0.3,
+                    hovertemplate="<br>".join([
+                            "<b>{lsoa11nm}</b><extra></extra>",
+                            "<br>Projects: {Projects in area}",
+                            "Organisations: {Organisations in area}<br>",
+                            "{Project stages}",
+                            ]),
+                    colorscale=getattr(px.colors.sequential,overall_config['colorbars']['area_projects']),
+                    colorbar_title_text='No. of Projects in Area',
+                    showscale=True),
+        'ICSs':dict(
+                    trace='ICSs',
+                    z=stps_pd['Project Number'],
+                    marker_opacity=0.5,
+                    hovertemplate=ics_hovertemplate,
+                    colorscale=colorbar_discretize(getattr(px.colors.sequential,overall_config['colorbars']['ics']),list(range(1,max_ics+2))),
+                    zmin=0,
+                    zmax=max_ics+1,
+                    colorbar_tickvals=list(range(0,max_ics+1)),
+                    colorbar_title_text='No. of Projects in ICS',
+                    colorbar_tickmode = 'array',
+                    showscale=True),
+        'ICSs: Projects at organisations in the ICS':dict(
+                    trace='ICSs',
+                    z=stps_pd['Projects in area'],
+                    marker_opacity=0.5,
+                    hovertemplate="<br>".join([
+                            "<b>{Name}</b><extra></extra>",
+                            "<br>Projects: {Projects in area}",
+                            "Organisations: {Organisations in area}<br>",
+                            "{Project stages}",
+                            ]),
+                    colorscale=getattr(px.colors.sequential,overall_config['colorbars']['area_projects']),
+                    colorbar_title_text='No. of Projects in Area',
+                    showscale=True),
+    }
+    #Highlighting a single ICS only swaps the z values on the shared ICS geometry
+    ics_layers={name:dict(
+                    trace='ICSs',
+                    z=stps_pd[name],
+                    marker_opacity=0.3,
+                    hovertemplate=ics_hovertemplate,
+                    colorscale=getattr(px.colors.sequential,overall_config['colorbars']['ics_selection']),
+                    zmin=0,
+                    zmax=1,
+                    showscale=False)
+                for name in stps_pd['Name']}
+    #Each geometry trace carries only the columns its layers' hovertemplates refer to
+    trace_frames={'LA':authority_pd,'LSOA':lsoa_pd,'ICSs':stps_pd}
+    for trace in layer_traces:
+        trace_layers=[layer for layer in [*layers.values(),*ics_layers.values()] if layer['trace']==trace]
+        customdata,*hovertemplates=hover_fields(trace_frames[trace],*[layer['hovertemplate'] for layer in trace_layers])
+        for layer,hovertemplate in zip(trace_layers,hovertemplates):
+            layer['hovertemplate']=hovertemplate
+        trace_geometry[trace]['customdata']=customdata.to_numpy()
+
+    restyle_attributes=sorted({attribute for layer in [*layers.values(),*ics_layers.values()] for attribute in layer if attribute!='trace'})
+
+    #Restyle arguments listing a value per trace: the selected layer's styling on its own trace, null on the hidden traces
+    #(which are restyled again whenever they are shown) and the organisations scatter left as it is
+    def restyle_layer(layer):
+        trace=layer_traces.index(layer['trace'])
+        restyle={'visible':[idx==trace for idx in range(len(layer_traces))]+[True]}
+        for attribute in restyle_attributes:
+            values=[None]*(len(layer_traces)+1)
+            values[trace]=layer.get(attribute)
+            restyle[attribute.replace('_','.')]=values
+        restyle['hovertemplate'][-1]=organisations_hovertemplate
+        return restyle
+
+    #Writing the geometry of each trace and the restyle/relayout of each layer as separate fragments
+    layers_dir=f'{outdir}/{overall_config["layers_dir"]}'
+    os.makedirs(layers_dir, exist_ok=True)
+    geometry_fragments={trace:write_fragment(layers_dir, f'geometry-{trace}', dict(trace_geometry[trace], trace=layer_traces.index(trace)))
+                        for trace in layer_traces}
+    def layer_fragment(idx, layer, relayout):
+        return write_fragment(layers_dir, f'layer-{idx}', dict(trace=layer_traces.index(layer['trace']), geometry=geometry_fragments[layer['trace']],
+                                                               restyle=restyle_layer(layer), relayout=relayout))
+
+    #Adding each descriptor to a dropdown, the button's name is the fragment loaded when it's selected
+    buttons_1=[]
+    for idx, (descriptor, layer) in enumerate(layers.items()):
+        buttons_1.append(dict(label = f'{descriptor}',
+                                method = 'skip',
+                                name = layer_fragment(idx, layer,
+                                        {'title': f'{descriptor}{overall_config["subheading"]}',
+                                        'showlegend':True,
+                                        }),
+                                ))
+    select_button(buttons_1)
+
+    #Adding each ICS to a dropdown
+    buttons_ics=[]
+    for idx, (name, layer) in enumerate(ics_layers.items()):
+        buttons_ics.append(dict(label = name,
+                    method = 'skip',
+                    name = layer_fragment(len(layers)+idx, layer,
+                    {'title': f'{name}{overall_config["subheading"]}',}
+                    )
+                    )
+                )
+    select_button(buttons_ics)
+    remove_unlisted(layers_dir, [*geometry_fragments.values(), *[button['name'] for button in buttons_1+buttons_ics if 'name' in button]])
+
+    #Adding organisations scatter layer
+    fig.add_scattermapbox(lat = organisations['Latitude']
+                        ,lon = organisations['Longitude']
+                        ,hovertext = organisations['Name']
+                        ,customdata = organisations_customdata
+                        ,hovertemplate=organisations_hovertemplate
+                        ,marker_color= organisations['Project Number']
+                        ,marker_colorscale=colorbar_discretize(getattr(px.colors.sequential,overall_config['colorbars']['scatter']),[0,1,2,3,4,5,6,7,8,9,10])
+                        ,marker_colorbar_title_text='No. of Projects (Scatter plot)'
+                        ,marker_colorbar_ticktext=list(range(int(min(organisations['Project Number'])),int(max(organisations['Project Number']+1))))
+                        ,marker_colorbar_tickvals=list(range(int(min(organisations['Project Number'])),int(max(organisations['Project Number']+1))))
+                        ,marker_colorbar_tickmode='array'
+                        ,marker_colorbar_x=0.52
+                        ,marker_colorbar_y=-0.22
+                        ,marker_colorbar_orientation='h'
+                        ,marker_size=10
+                        ,name='Organisations'
+                        ,opacity=0.9
+                        ,visible=False
+                        ,showlegend=True
+                        )
+    #Styling the map
+    fig.update_layout(title=dict(
+                            text=f'{overall_config["title_default"]} {overall_config["subheading"]}',
+                            yanchor="top", xanchor="left",
+                            y=0.96, x=0.02),
+                    mapbox=dict(
+                        style="open-street-map",
+                        zoom=6,
+                        center={"lat": 52.1951, "lon": 0.1313}),
+                    legend=dict(
+                    yanchor="top",
+                    y=0.99,
+                    xanchor="left",
+                    x=0.01
+                    ),
+                    updatemenus=[
+                        {"buttons": buttons_1,'x':overall_config['heatmap_button']["pos_x"],'y':overall_config['heatmap_button']["pos_y"],'active':0},
+                        {"buttons": buttons_ics,'x':overall_config['ics_button']["pos_x"],'y':overall_config['ics_button']["pos_y"]}],)
+
+    #Output overall view
+    write_view(fig, outdir, overall_config["filename"], post_script=lazy_layers_script(overall_config["layers_dir"], config['geometry']['tiles']['directory']))
+    print(f'{overall_config["filename"]} was created')
+    return overall_config['filename']
+
+
+#Packages whichever views were built, passed by stage name
+def package_views(config, outdir, **views):
+    return package_site(outdir, config, list(views.values()))
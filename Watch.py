@@ -0,0 +1,52 @@
+import os, time
+
+#Files generate writes into the data folder, which mustn't trigger a rebuild
+DERIVED_FILES = ('implementation_report', 'report_cache', 'build_cache', 'geometry_files', 'area_tables')
+
+
+#Input files named in the config, the portfolio reports and the config itself
+def watched_files(path_to_data, config, path_to_config):
+    files = config['files']
+    paths = [path_to_config]
+    for name, file in files.items():
+        if name in DERIVED_FILES or name == 'individual_reports':
+            continue
+        paths += [f'{path_to_data}/{value}' for value in file.values()] if isinstance(file, dict) else [f'{path_to_data}/{file}']
+    reports = f"{path_to_data}/{files['individual_reports']}"
+    if os.path.isdir(reports):
+        paths += [entry.path for entry in os.scandir(reports) if entry.is_file()]
+    return paths
+
+
+#Size and modification time of each file, missing files are left out
+def snapshot(paths):
+    state = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            state[path] = (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            continue
+    return state
+
+
+def wait_for_changes(paths, previous, interval=1, debounce=2):
+
+    '''
+    Polls the files listed by paths() until any of them is added, changed or removed, then waits until they've
+    stopped changing for debounce seconds, so a burst of edits (or a file still being copied) only causes one rebuild.\n
+    Returns the new snapshot and the paths that changed.
+    '''
+
+    current = previous
+    while current == previous:
+        time.sleep(interval)
+        current = snapshot(paths())
+    settled = time.monotonic()
+    while time.monotonic() - settled < debounce:
+        time.sleep(min(interval, debounce))
+        latest = snapshot(paths())
+        if latest != current:
+            current, settled = latest, time.monotonic()
+    changed = sorted(path for path in set(previous) | set(current) if previous.get(path) != current.get(path))
+    return current, changed
@@ -0,0 +1,74 @@
+import os, sys, time, yaml, shutil, resource, platform, tempfile, multiprocessing, fire
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from synthetic import BOUNDS, grid_features, write_geojson
+
+#Roughly England, so the synthetic region (BOUNDS) is a small part of the file as it is of the national shapefiles
+NATIONAL_BOUNDS = (-5.7, 50.0, 1.8, 55.8)
+
+
+#Peak resident memory of this process in MB, since reset_peak on Linux (ru_maxrss is in KB on Linux, bytes on macOS)
+def peak_rss():
+    if os.path.exists('/proc/self/status'):
+        with open('/proc/self/status', 'r') as file:
+            return next(int(line.split()[1]) for line in file if line.startswith('VmHWM')) / 1024
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if platform.system() == 'Darwin' else rss / 1024
+
+
+#Resets the peak to the current resident memory, where the kernel allows it
+def reset_peak():
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+    except OSError:
+        pass
+
+
+#Run in a fresh process, so each load's peak memory is measured on its own
+def timed_load(path_to_data, config, bbox):
+    from Geometry import load_geometry
+    reset_peak()
+    baseline = peak_rss()
+    start = time.perf_counter()
+    df = load_geometry(path_to_data, config, 'lsoas', bbox=bbox)
+    return time.perf_counter() - start, len(df), peak_rss() - baseline
+
+
+def run(sizes=(10000, 35000), repeat=3, vertices_per_edge=40, path_to_config='config_mkdocs.yml'):
+
+    '''
+    Times loading a national LSOA layer from the geometry cache in full and for the synthetic region only (bbox pushdown).\n
+    sizes - Numbers of LSOAs in the national layer.\n
+    repeat - Timed loads of each kind, the fastest is reported.\n
+    vertices_per_edge - Vertices along each side of the synthetic LSOAs.
+    '''
+
+    with open(path_to_config, 'r') as file:
+        config = yaml.safe_load(file)
+    level = config['geometry']['level']
+    #Only the level that's loaded is cached
+    config['geometry']['levels'] = {level: config['geometry']['levels'][level]}
+    from Geometry import update_geometry_cache
+    context = multiprocessing.get_context('spawn')
+    print(f"{'lsoas':>8} {'load':>8} {'rows':>8} {'seconds':>9} {'peak MB':>9}")
+    for n_lsoas in sizes:
+        path_to_data = tempfile.mkdtemp(prefix='geometry-benchmark-')
+        try:
+            write_geojson(f"{path_to_data}/{config['files']['geojson_files']['lsoas']}",
+                          grid_features(n_lsoas, lambda idx: {'LSOA11CD': f'E0100{idx:05d}'}, vertices_per_edge, NATIONAL_BOUNDS))
+            update_geometry_cache(path_to_data, config, files=('lsoas',))
+            for name, bbox in [('full', None), ('region', list(BOUNDS))]:
+                results = []
+                for _ in range(repeat):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        results.append(pool.submit(timed_load, path_to_data, config, bbox).result())
+                seconds, rows, memory = min(results)
+                print(f'{n_lsoas:>8} {name:>8} {rows:>8} {seconds:>9.3f} {memory:>9.1f}')
+        finally:
+            shutil.rmtree(path_to_data, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    fire.Fire(run)
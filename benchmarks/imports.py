@@ -0,0 +1,48 @@
+import os, sys, json, time, subprocess, fire
+
+REPO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+#Modules the CLI mustn't import before a stage that needs them runs
+HEAVY_MODULES = ('pandas', 'numpy', 'plotly', 'geopandas', 'shapely', 'pyarrow')
+
+
+#Imports a module in a fresh interpreter, returning the import time and the heavy modules it pulled in
+def import_module(module):
+    code = (f'import sys, time, json; start = time.perf_counter(); import {module}; seconds = time.perf_counter() - start; '
+            f'print(json.dumps([seconds, [name for name in {HEAVY_MODULES!r} if name in sys.modules]]))')
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+#Wall time of a CLI command in a fresh interpreter
+def run_command(*args):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, 'Mapping.py', *args], cwd=REPO, capture_output=True, check=True)
+    return time.perf_counter() - start
+
+
+def run(repeat=5, limit=0.5, output=None):
+
+    '''
+    Times importing Mapping and running the CLI's help, the best of repeat runs each.\n
+    limit - Seconds importing Mapping may take before it's reported as a regression.\n
+    output - JSON file to save the results to.\n
+    Also fails if importing Mapping loads any of pandas, numpy, plotly, geopandas, shapely or pyarrow.
+    '''
+
+    imports = [import_module('Mapping') for _ in range(repeat)]
+    results = {'import_seconds': min(seconds for seconds, _ in imports), 'heavy_modules': imports[0][1],
+               'help_seconds': min(run_command('generate', '--help') for _ in range(repeat)),
+               'organisations_help_seconds': min(run_command('generate', 'organisations', '--help') for _ in range(repeat))}
+    for name, value in results.items():
+        print(f'{name:<28}{value}')
+    if output:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+    if results['heavy_modules']:
+        sys.exit(f"Importing Mapping loads {', '.join(results['heavy_modules'])}")
+    if results['import_seconds'] > limit:
+        sys.exit(f"Importing Mapping took {results['import_seconds']:.2f}s, over the {limit}s limit")
+
+
+if __name__ == "__main__":
+    fire.Fire(run)
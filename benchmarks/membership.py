@@ -0,0 +1,66 @@
+import os, sys, time, fire
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Membership import organisation_projects, project_lists, project_frames
+
+
+#Synthetic organisations and implementation report rows, each project running at a few organisations
+def synthetic_data(n_projects, n_organisations=None, orgs_per_project=4, seed=0):
+    rng = np.random.default_rng(seed)
+    n_organisations = n_organisations or max(10, n_projects // 5)
+    organisations = pd.DataFrame({'Name': [f'Organisation {i}' for i in range(n_organisations)],
+                                  'Latitude': rng.uniform(51.5, 53, n_organisations),
+                                  'Longitude': rng.uniform(-1, 1.7, n_organisations)})
+    project_names = np.repeat([f'Portfolio {i % 7} - Project {i}' for i in range(n_projects)], orgs_per_project)
+    implementation_report = pd.DataFrame({'Name': organisations['Name'].to_numpy()[rng.integers(0, n_organisations, len(project_names))],
+                                          'ProjectName': project_names,
+                                          'Stage': rng.choice(['1 - Knowledge', '2 - Interest', '3 - Decision', '4 - Implementation'], len(project_names))})
+    return organisations, implementation_report
+
+
+#The substring matching used before the membership index, kept for comparison
+def legacy_membership(organisations, implementation_report, project_names):
+    projects = {}
+    for i in organisations['Name'].to_list():
+        projects[i] = '\n'.join(implementation_report.query(f'Name.str.contains("{i}")')['ProjectName'].to_list())
+    projects = pd.DataFrame.from_dict(projects, orient='index', columns=['Projects'])
+    organisations = organisations.merge(projects, left_on='Name', right_index=True)
+    project_dfs = {}
+    for i in project_names:
+        project_dfs[i] = organisations.query(f'Projects.str.contains("{i}",regex = False)')
+        project_dfs[i] = project_dfs[i].merge(implementation_report.query(f'ProjectName.str.contains("{i}",regex = False)'), left_on='Name', right_on='Name')
+    return project_dfs
+
+
+def indexed_membership(organisations, implementation_report, project_names):
+    organisations = organisations.merge(project_lists(organisations, implementation_report), left_on='Name', right_index=True)
+    return project_frames(organisation_projects(organisations, implementation_report), project_names)
+
+
+def run(sizes=(250, 500, 1000, 2000, 4000), legacy=True, legacy_limit=2000):
+
+    '''
+    Times building the organisation/project membership for increasing numbers of projects.\n
+    sizes - Numbers of projects to benchmark.\n
+    legacy - Also time the previous substring matching (only up to legacy_limit projects, as it scales quadratically).
+    '''
+
+    print(f"{'projects':>10} {'rows':>8} {'indexed (s)':>12} {'legacy (s)':>12}")
+    for n_projects in sizes:
+        organisations, implementation_report = synthetic_data(n_projects)
+        project_names = sorted(set(implementation_report['ProjectName']))
+        start = time.perf_counter()
+        indexed_membership(organisations, implementation_report, project_names)
+        indexed = time.perf_counter() - start
+        legacy_time = ''
+        if legacy and n_projects <= legacy_limit:
+            start = time.perf_counter()
+            legacy_membership(organisations, implementation_report, project_names)
+            legacy_time = f'{time.perf_counter() - start:.3f}'
+        print(f'{n_projects:>10} {len(implementation_report):>8} {indexed:>12.3f} {legacy_time:>12}')
+
+
+if __name__ == "__main__":
+    fire.Fire(run)
@@ -0,0 +1,141 @@
+import os, sys, json, time, glob, yaml, shutil, resource, platform, tempfile, subprocess, fire
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import Mapping, Views
+from Stages import run_pipeline, resolve
+from synthetic import generate_data
+
+REPO = os.path.join(os.path.dirname(__file__), '..')
+
+
+#Peak resident memory of this process so far in MB (ru_maxrss is in KB on Linux, bytes on macOS)
+def peak_rss():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if platform.system() == 'Darwin' else rss / 1024
+
+
+def git_commit():
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+#Wraps a function so each call's wall time is added to timings[name]
+def timed(func, timings, name):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[name] = timings.get(name, 0) + time.perf_counter() - start
+    return wrapper
+
+
+def record(stages, name, func, kwargs):
+    start = time.perf_counter()
+    result = func(**kwargs)
+    stages.append({'name': name, 'seconds': time.perf_counter() - start, 'peak_rss_mb': peak_rss()})
+    return result
+
+
+def output_sizes(outdir, assets, layers_dir):
+    sizes = {}
+    for view, hashed in assets.items():
+        sizes[view] = {ext or 'raw': os.path.getsize(f'{outdir}/{hashed}{ext}')
+                       for ext in ('', '.gz', '.br') if os.path.exists(f'{outdir}/{hashed}{ext}')}
+    fragments = [path for path in glob.glob(f'{outdir}/{layers_dir}/*') if not path.endswith(('.gz', '.br'))]
+    sizes[layers_dir] = {'files': len(fragments), 'raw': sum(os.path.getsize(path) for path in fragments)}
+    return sizes
+
+
+def run(n_organisations=50, n_projects=100, n_portfolios=7, n_lsoas=1000, n_authorities=40, repeat=1,
+        output=None, path_to_config='config_mkdocs.yml', keep=None):
+
+    '''
+    Times every stage of generate against synthetic data, one stage at a time.\n
+    n_organisations, n_projects, n_portfolios, n_lsoas, n_authorities - Size of the synthetic dataset.\n
+    repeat - Number of timed runs, the first run also builds the report and geometry caches.\n
+    output - JSON file to save the results to, for comparing between commits.\n
+    keep - Folder to write the data and views to and keep, a temporary folder is used otherwise.
+    '''
+
+    with open(path_to_config, 'r') as file:
+        config = yaml.safe_load(file)
+    workdir = keep or tempfile.mkdtemp(prefix='mapping-benchmark-')
+    path_to_data, outdir = f'{workdir}/data', f'{workdir}/out'
+    os.makedirs(outdir, exist_ok=True)
+    parameters = dict(n_organisations=n_organisations, n_projects=n_projects, n_portfolios=n_portfolios,
+                      n_lsoas=n_lsoas, n_authorities=n_authorities)
+    generate_data(path_to_data, path_to_config=path_to_config, **parameters)
+
+    runs = []
+    original_write_view = Views.write_view
+    try:
+        for _ in range(repeat):
+            stages, write_timings = [], {}
+            #Views look up write_view in their module's namespace, so the time spent writing HTML can be separated out
+            Views.write_view = timed(original_write_view, write_timings, 'write_html')
+            pipeline = Mapping.pipeline_stages(path_to_data, config, {'external': outdir})
+            for stage in pipeline:
+                stage.func = (lambda func, name: lambda **kwargs: record(stages, name, func, kwargs))(resolve(stage.func), stage.name)
+            start = time.perf_counter()
+            values = run_pipeline(pipeline, workers=1)
+            runs.append({'total_seconds': time.perf_counter() - start, 'stages': stages,
+                         'write_html_seconds': write_timings.get('write_html', 0), 'peak_rss_mb': peak_rss(),
+                         'output_bytes': output_sizes(outdir, values['assets@external'], config['overall_view']['layers_dir'])})
+    finally:
+        Views.write_view = original_write_view
+        if keep is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {'commit': git_commit(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+               'parameters': parameters, 'runs': runs}
+    for run_number, result in enumerate(runs, 1):
+        print(f"Run {run_number}: {result['total_seconds']:.2f}s, write_html {result['write_html_seconds']:.2f}s, peak RSS {result['peak_rss_mb']:.0f}MB")
+        for stage in result['stages']:
+            print(f"  {stage['name']:<28}{stage['seconds']:>8.3f}s{stage['peak_rss_mb']:>8.0f}MB")
+    if output:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'Results were saved to {output}')
+    return None if output else results
+
+
+#Best time for each stage over a results file's runs
+def best_times(results):
+    times = {'total': min(run['total_seconds'] for run in results['runs']),
+             'write_html': min(run['write_html_seconds'] for run in results['runs'])}
+    for run in results['runs']:
+        for stage in run['stages']:
+            times[stage['name']] = min(times.get(stage['name'], stage['seconds']), stage['seconds'])
+    return times
+
+
+def compare(baseline, current, threshold=0.1):
+
+    '''
+    Compares the best stage times of two results files written by run.\n
+    threshold - Relative slowdown reported as a regression.
+    '''
+
+    with open(baseline, 'r') as file:
+        baseline = json.load(file)
+    with open(current, 'r') as file:
+        current = json.load(file)
+    if baseline['parameters'] != current['parameters']:
+        print('Warning: the results were run with different parameters')
+    before, after = best_times(baseline), best_times(current)
+    print(f"{'stage':<28}{baseline['commit'] or 'baseline':>12}{current['commit'] or 'current':>12}{'change':>10}")
+    regressions = []
+    for name in before:
+        if name not in after:
+            continue
+        change = (after[name] - before[name]) / before[name] if before[name] else 0
+        flag = ' regression' if change > threshold and after[name] - before[name] > 0.01 else ''
+        if flag:
+            regressions.append(name)
+        print(f"{name:<28}{before[name]:>11.3f}s{after[name]:>11.3f}s{change:>+10.1%}{flag}")
+    return None if not regressions else f'{len(regressions)} stage(s) slower than the baseline'
+
+
+if __name__ == "__main__":
+    fire.Fire({'run': run, 'compare': compare, 'data': generate_data})
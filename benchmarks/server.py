@@ -0,0 +1,194 @@
+import os, re, sys, gzip, time, random, shutil, tempfile, threading, http.client, fire
+from functools import partial
+from urllib.parse import urljoin, urlsplit
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Bundle import brotli, precompress_site
+from Server import make_server
+
+#Local files a page loads (iframes, scripts, stylesheets, fetched fragments)
+LINKS = re.compile(r'''(?:src|href)=["']([^"'#?:]+\.(?:html|js|css|json))["']''')
+#Views embedded in the pages in iframes, rather than pages of their own
+EMBEDDED = ('view', 'organisationpage', 'projectpage', 'overviewpage')
+
+
+#Whether a link is to another page of the site (not followed when loading a page)
+def is_page(link):
+    return link.endswith('.html') and not os.path.basename(link).startswith(EMBEDDED)
+
+
+#Pages that look like the built site: each embeds a hashed view, which loads the shared hashed plotly.js and some fragments
+def write_site(directory, n_pages, asset_kb):
+    lines = ''.join(f'var trace{idx} = {{"lat": {[round(random.uniform(51, 53), 5) for _ in range(50)]}}};\n'
+                    for idx in range(asset_kb * 1024 // 400))
+    with open(f'{directory}/plotly.min.aa1d78498a3b.js', 'w') as file:
+        file.write(lines)
+    os.makedirs(f'{directory}/overview_layers', exist_ok=True)
+    for page in range(n_pages):
+        fragments = [f'overview_layers/layer-{page}-{idx}.{random.getrandbits(48):012x}.json' for idx in range(4)]
+        for fragment in fragments:
+            with open(f'{directory}/{fragment}', 'w') as file:
+                file.write(lines[:len(lines) // 8])
+        view = f'view{page}.{random.getrandbits(48):012x}.html'
+        with open(f'{directory}/{view}', 'w') as file:
+            file.write('<html><script src="plotly.min.aa1d78498a3b.js"></script>'
+                       + ''.join(f'<link href="{fragment}">' for fragment in fragments) + '</html>')
+        with open(f'{directory}/page{page}.html' if page else f'{directory}/index.html', 'w') as file:
+            file.write('<html><body>' + ''.join(f'<a href="page{idx}.html">Page {idx}</a>' for idx in range(1, n_pages))
+                       + f'<iframe src="{view}"></iframe>' + 'Text ' * 2000 + '</body></html>')
+    precompress_site(directory)
+
+
+def decode(body, encoding):
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    if encoding == 'br':
+        return brotli.decompress(body)
+    return body
+
+
+class Browser(object):
+
+    '''
+    One keep-alive connection with a browser-like cache: files marked immutable are reused without a request, others
+    are revalidated with their ETag.
+    '''
+
+    def __init__(self, host, port, accept_encoding, stats):
+        self.connection = http.client.HTTPConnection(host, port, timeout=30)
+        self.accept_encoding, self.stats = accept_encoding, stats
+        self.cache = {}
+
+    def get(self, path):
+        etag, immutable, links = self.cache.get(path, (None, False, []))
+        if immutable:
+            self.stats['cached'] += 1
+            return links
+        headers = {'Accept-Encoding': self.accept_encoding} if self.accept_encoding else {}
+        if etag:
+            headers['If-None-Match'] = etag
+        start = time.perf_counter()
+        try:
+            self.connection.request('GET', path, headers=headers)
+            response = self.connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.stats['errors'] += 1
+            return []
+        self.stats['latencies'].append(time.perf_counter() - start)
+        self.stats['bytes'] += len(body)
+        if response.status == 304:
+            self.stats['not_modified'] += 1
+            return links
+        if response.status != 200:
+            self.stats['errors'] += 1
+            return []
+        if path.endswith('.html'):
+            text = decode(body, response.getheader('Content-Encoding')).decode('utf-8', 'ignore')
+            links = [urljoin(path, link) for link in LINKS.findall(text)]
+        self.cache[path] = (response.getheader('ETag'), 'immutable' in (response.getheader('Cache-Control') or ''), links)
+        return links
+
+    #Loads a page and everything it embeds, as a browser would
+    def visit(self, path, seen=None):
+        seen = set() if seen is None else seen
+        seen.add(path)
+        for link in self.get(path):
+            if link in seen:
+                continue
+            if not is_page(link):
+                self.visit(link, seen)
+
+    def close(self):
+        self.connection.close()
+
+
+#Every user visits pages at random, each over its own connection
+def load(host, port, pages, clients, visits, accept_encoding):
+    stats = {'latencies': [], 'bytes': 0, 'not_modified': 0, 'cached': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def user(seed):
+        own = {'latencies': [], 'bytes': 0, 'not_modified': 0, 'cached': 0, 'errors': 0}
+        browser = Browser(host, port, accept_encoding, own)
+        choose = random.Random(seed)
+        for _ in range(visits):
+            browser.visit(choose.choice(pages))
+        browser.close()
+        with lock:
+            for key, value in own.items():
+                stats[key] += value
+
+    threads = [threading.Thread(target=user, args=(seed,)) for seed in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.perf_counter() - start
+
+
+#The plain http.server this replaces, one connection per request and no conditional or compressed responses
+class PlainHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def run(site=None, url=None, clients=(1, 16, 64), visits=20, n_pages=8, asset_kb=512, encodings=('br, gzip', 'gzip', None), baseline=True):
+
+    '''
+    Load test of the site server (Server.py): concurrent users each browse pages at random over a keep-alive connection,
+    reusing immutable files and revalidating the rest with If-None-Match, as a browser with a warm cache would.\n
+    site - Built site to serve (e.g. mkdocs/site from Mapping.py publish --noserve), defaults to a synthetic site.\n
+    url - Test a server that's already running instead, e.g. http://127.0.0.1:8000/.\n
+    clients - Numbers of concurrent users.\n
+    visits - Pages each user visits.\n
+    n_pages, asset_kb - Pages of the synthetic site and size of its shared script.\n
+    encodings - Accept-Encoding headers to test (None sends none).\n
+    baseline - Also run the same load against python -m http.server.
+    '''
+
+    clients = clients if isinstance(clients, (tuple, list)) else (clients,)
+    encodings = encodings if isinstance(encodings, (tuple, list)) else (encodings,)
+    if brotli is None:
+        encodings = [encoding for encoding in encodings if not encoding or 'br' not in encoding]
+    directory, servers = None, []
+    try:
+        if url is None:
+            if site is None:
+                directory = site = tempfile.mkdtemp(prefix='server-benchmark-')
+                write_site(site, n_pages, asset_kb)
+            servers.append(('Server.py', make_server(site, port=0, quiet=True)))
+            if baseline:
+                servers.append(('http.server', ThreadingHTTPServer(('127.0.0.1', 0), partial(PlainHandler, directory=site))))
+            for _, server in servers:
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+            targets = [(name, '127.0.0.1', server.server_address[1]) for name, server in servers]
+        else:
+            parts = urlsplit(url)
+            targets = [(url, parts.hostname, parts.port or 80)]
+
+        print(f"{'server':>12} {'encoding':>10} {'clients':>8} {'seconds':>8} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'304s':>7} {'cached':>7} {'MB sent':>8} {'errors':>7}")
+        for name, host, port in targets:
+            #Pages are the ones linked from the home page
+            discover = {'latencies': [], 'bytes': 0, 'not_modified': 0, 'cached': 0, 'errors': 0}
+            pages = ['/index.html'] + [link for link in Browser(host, port, None, discover).get('/index.html') if is_page(link)]
+            for encoding in (encodings if name != 'http.server' else [None]):
+                for n_clients in clients:
+                    stats, seconds = load(host, port, pages, n_clients, visits, encoding)
+                    latencies = sorted(stats['latencies']) or [0]
+                    print(f"{name[-12:]:>12} {(encoding or 'none').split(',')[0]:>10} {n_clients:>8} {seconds:>8.2f} {len(latencies):>9} {len(latencies) / seconds:>8.0f} "
+                          f"{latencies[len(latencies) // 2] * 1000:>8.1f} {latencies[int(len(latencies) * 0.95)] * 1000:>8.1f} "
+                          f"{stats['not_modified']:>7} {stats['cached']:>7} {stats['bytes'] / 1024 ** 2:>8.1f} {stats['errors']:>7}")
+    finally:
+        for _, server in servers:
+            server.shutdown()
+            server.server_close()
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    fire.Fire(run)
@@ -0,0 +1,102 @@
+import os, json, math, yaml, fire
+import numpy as np
+import pandas as pd
+
+#Region covered by the synthetic polygons, roughly the East of England
+BOUNDS = (-1.0, 51.5, 1.7, 53.0)
+
+ICS_SHAPEFILE_NAMES = ['Cambridgeshire and Peterborough', 'Norfolk and Waveney Health and Care Partnership',
+                       'Suffolk and North East Essex', 'Bedfordshire, Luton and Milton Keynes',
+                       'Hertfordshire and West Essex', 'Mid and South Essex']
+ICS_NAMES = ['ICS: Cambridge and Peterborough', 'ICS: Norfolk and Waveney', 'ICS: Suffolk and North East Essex',
+             'ICS: BLMK', 'ICS: Herts and West Essex', 'Mid and South Essex']
+STAGES = ['1 - Knowledge', '2 - Interest', '3 - Decision', '4 - Implementation', '5 - Adoption', '6 - Spread', None]
+INTERESTS = ['Interested - Yes - keen', 'Decision No - not at this time', 'Decision Yes - agreed', None]
+
+
+#A rectangle with extra vertices along each edge, so neighbouring cells share identical borders as real coverages do
+def cell(x0, y0, x1, y1, vertices_per_edge):
+    xs = np.linspace(x0, x1, vertices_per_edge)
+    ys = np.linspace(y0, y1, vertices_per_edge)
+    ring = ([[x, y0] for x in xs] + [[x1, y] for y in ys[1:]] +
+            [[x, y1] for x in xs[::-1][1:]] + [[x0, y] for y in ys[::-1][1:-1]])
+    return {'type': 'Polygon', 'coordinates': [ring + [ring[0]]]}
+
+
+#Splits the region (BOUNDS unless given) into a grid of roughly n cells
+def grid_features(n, properties, vertices_per_edge=8, bounds=BOUNDS):
+    columns = math.ceil(math.sqrt(n))
+    rows = math.ceil(n / columns)
+    x0, y0, x1, y1 = bounds
+    dx, dy = (x1 - x0) / columns, (y1 - y0) / rows
+    return [{'type': 'Feature', 'properties': properties(idx),
+             'geometry': cell(x0 + (idx % columns) * dx, y0 + (idx // columns) * dy,
+                              x0 + (idx % columns + 1) * dx, y0 + (idx // columns + 1) * dy, vertices_per_edge)}
+            for idx in range(n)]
+
+
+def write_geojson(path, features):
+    with open(path, 'w') as file:
+        json.dump({'type': 'FeatureCollection', 'features': features}, file)
+
+
+def generate_data(outdir, n_organisations=50, n_projects=100, n_portfolios=7, n_lsoas=1000, n_authorities=40,
+                  orgs_per_project=4, path_to_config='config_mkdocs.yml', seed=0):
+
+    '''
+    Writes a synthetic data folder with every input generate reads, named as in the config.\n
+    outdir - Folder to write the data to (used as path_to_data).\n
+    n_organisations, n_projects, n_portfolios, n_lsoas, n_authorities - Size of the synthetic dataset.\n
+    orgs_per_project - Number of organisations each project runs at.
+    '''
+
+    with open(path_to_config, 'r') as file:
+        files = yaml.safe_load(file)['files']
+    rng = np.random.default_rng(seed)
+    x0, y0, x1, y1 = BOUNDS
+    os.makedirs(f"{outdir}/{files['individual_reports']}", exist_ok=True)
+
+    #Shapefiles
+    lsoa_codes = [f'E0100{idx:04d}' for idx in range(n_lsoas)]
+    authority_codes = [f'E0700{idx:04d}' for idx in range(n_authorities)]
+    write_geojson(f"{outdir}/{files['geojson_files']['lsoas']}",
+                  grid_features(n_lsoas, lambda idx: {'LSOA11CD': lsoa_codes[idx], 'LSOA11NM': f'LSOA {idx}'}))
+    write_geojson(f"{outdir}/{files['geojson_files']['local_authorities']}",
+                  grid_features(n_authorities, lambda idx: {'LAD21CD': authority_codes[idx], 'LAD21NM': f'Authority {idx}'}))
+    write_geojson(f"{outdir}/{files['geojson_files']['stps']}",
+                  grid_features(len(ICS_SHAPEFILE_NAMES), lambda idx: {'FID': idx, 'STP21CD': f'E5400{idx:04d}', 'STP21NM': ICS_SHAPEFILE_NAMES[idx]}))
+
+    #Organisations, including the ICSs themselves
+    pd.DataFrame({'Name': ICS_NAMES, 'Longitude': rng.uniform(x0, x1, len(ICS_NAMES)),
+                  'Latitude': rng.uniform(y0, y1, len(ICS_NAMES))}).to_csv(f"{outdir}/{files['ics_locations']}", index=False)
+    organisation_names = [f'Organisation {idx}' for idx in range(n_organisations)] + ICS_NAMES[:5]
+    pd.DataFrame({'Name': organisation_names, 'Postcode': 'CB1 1AA',
+                  'Latitude': rng.uniform(y0, y1, len(organisation_names)),
+                  'Longitude': rng.uniform(x0, x1, len(organisation_names))}).to_csv(f"{outdir}/{files['organisations']}", index=False)
+
+    #Portfolio reports, one CSV per portfolio
+    for portfolio in range(n_portfolios):
+        projects = range(portfolio, n_projects, n_portfolios)
+        rows = len(projects) * orgs_per_project
+        pd.DataFrame({'Name': np.concatenate([rng.choice(organisation_names, orgs_per_project, replace=False) for _ in projects]) if rows else [],
+                      'ProjectName': np.repeat([f'Project {project}' for project in projects], orgs_per_project),
+                      'Stage': rng.choice(np.array(STAGES, dtype=object), rows),
+                      'Interest': rng.choice(np.array(INTERESTS, dtype=object), rows),
+                      'WhyImportant': ['Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * int(n) for n in rng.integers(0, 4, rows)],
+                      }).to_csv(f"{outdir}/{files['individual_reports']}/Portfolio {portfolio}.csv", index=False)
+
+    #Demographics
+    pd.DataFrame({'LSOA_CODE': lsoa_codes, 'BAME %': rng.uniform(0, 40, n_lsoas).round(1)}).to_csv(f"{outdir}/{files['ethnicity']}", index=False)
+    pd.DataFrame({'LSOA_CODE': lsoa_codes, **{column: rng.integers(100, 500, n_lsoas) for column in
+                  ['Age 0 to 24', 'Age 25 to 49', 'Age 50 to 64', 'Age 65 and over']}}).to_csv(f"{outdir}/{files['age']}", index=False)
+    pd.DataFrame({'lsoa11cd': lsoa_codes, 'lsoa11nm': [f'LSOA {idx}' for idx in range(n_lsoas)],
+                  'IMDDec0': rng.integers(1, 11, n_lsoas)}).to_csv(f"{outdir}/{files['imds']}", index=False)
+    pd.DataFrame({'Local Authority District code (2019)': authority_codes,
+                  'Income deprivation rate quintile': rng.integers(1, 6, n_authorities)}).to_csv(f"{outdir}/{files['imd_regional']}", index=False)
+    pd.DataFrame({'Area code': authority_codes, '% of all persons 65+': rng.uniform(10, 30, n_authorities).round(1)}).to_csv(f"{outdir}/{files['population_regional']}", index=False)
+    pd.DataFrame({'Area code': authority_codes, 'BAME %': rng.uniform(0, 40, n_authorities).round(1)}).to_csv(f"{outdir}/{files['ethnicity_regional']}", index=False)
+    return outdir
+
+
+if __name__ == "__main__":
+    fire.Fire(generate_data)
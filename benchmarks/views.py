@@ -0,0 +1,47 @@
+import os, sys, time, fire
+import numpy as np
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import Views
+from Prepare import prepare_reports, prepare_projects
+from membership import synthetic_data
+
+
+#Raw organisations and report with the columns the views use
+def synthetic_report(n_projects, seed=0):
+    rng = np.random.default_rng(seed)
+    organisations, report = synthetic_data(n_projects, seed=seed)
+    report['Interest'] = rng.choice(['Yes - keen to adopt', 'Decision No - not a priority', 'Awaiting decision'], len(report))
+    report['WhyImportant'] = rng.choice(['Improves patient outcomes and reduces the time clinicians spend on admin' * 2, ''], len(report))
+    report['Portfolio'] = report['ProjectName'].str.split(' - ').str[0]
+    return organisations, report
+
+
+def run(sizes=(250, 500, 1000, 2000, 4000), path_to_config='config_mkdocs.yml'):
+
+    '''
+    Times building the organisation and project views (without writing them) for increasing numbers of projects,
+    with about one organisation per five projects.\n
+    sizes - Numbers of projects to benchmark.
+    '''
+
+    with open(os.path.join(os.path.dirname(__file__), '..', path_to_config)) as file:
+        config = yaml.safe_load(file)
+    Views.write_view = lambda *args, **kwargs: None
+    print(f"{'projects':>10} {'rows':>8} {'organisations (s)':>18} {'projects (s)':>14} {'ms per project':>16}")
+    for n_projects in sizes:
+        organisations, report = synthetic_report(n_projects)
+        implementation_report, organisation_counts = prepare_reports(report, organisations)
+        _, project_names, membership = prepare_projects(implementation_report, organisation_counts)
+        start = time.perf_counter()
+        Views.generate_organisation_view(implementation_report, config, None)
+        organisation_time = time.perf_counter() - start
+        start = time.perf_counter()
+        Views.generate_project_view(project_names, membership, implementation_report, config, None)
+        project_time = time.perf_counter() - start
+        print(f'{n_projects:>10} {len(report):>8} {organisation_time:>18.3f} {project_time:>14.3f} {1000 * (organisation_time + project_time) / n_projects:>16.2f}')
+
+
+if __name__ == "__main__":
+    fire.Fire(run)
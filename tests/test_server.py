@@ -0,0 +1,50 @@
+import os, sys, gzip, threading, http.client
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Server import make_server, IMMUTABLE, REVALIDATE
+
+FILES = ['index.html', 'plotly.min.aa1d78498a3b.js', 'overview_layers/layer-0.3676a1b23dd0.json',
+         'assets/javascripts/bundle.d7400e89.min.js', 'report.20231015.html', 'export.12345678.png', 'deadbeef.html']
+
+
+@pytest.fixture
+def site(tmp_path):
+    for name in FILES:
+        os.makedirs(os.path.dirname(tmp_path / name), exist_ok=True)
+        (tmp_path / name).write_bytes(f'contents of {name}'.encode() * 20)
+    (tmp_path / 'index.html.gz').write_bytes(gzip.compress((tmp_path / 'index.html').read_bytes()))
+    server = make_server(str(tmp_path), port=0, quiet=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield http.client.HTTPConnection('127.0.0.1', server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+def get(connection, path, **headers):
+    connection.request('GET', path, headers=headers)
+    response = connection.getresponse()
+    return response, response.read()
+
+
+@pytest.mark.parametrize('path', ['/plotly.min.aa1d78498a3b.js', '/overview_layers/layer-0.3676a1b23dd0.json',
+                                  '/assets/javascripts/bundle.d7400e89.min.js'])
+def test_hashed_files_are_immutable(site, path):
+    response, _ = get(site, path)
+    assert response.status == 200 and response.getheader('Cache-Control') == IMMUTABLE
+
+
+@pytest.mark.parametrize('path', ['/index.html', '/report.20231015.html', '/export.12345678.png', '/deadbeef.html'])
+def test_other_files_are_revalidated(site, path):
+    response, _ = get(site, path)
+    assert response.status == 200 and response.getheader('Cache-Control') == REVALIDATE
+
+
+def test_precompressed_copy_and_not_modified(site):
+    response, body = get(site, '/index.html', **{'Accept-Encoding': 'gzip'})
+    assert response.getheader('Content-Encoding') == 'gzip' and response.getheader('Vary') == 'Accept-Encoding'
+    assert gzip.decompress(body).startswith(b'contents of index.html')
+    response, body = get(site, '/index.html', **{'Accept-Encoding': 'gzip', 'If-None-Match': response.getheader('ETag')})
+    assert response.status == 304 and body == b''
+    response, _ = get(site, '/index.html.gz')
+    assert response.status == 404
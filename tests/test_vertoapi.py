@@ -0,0 +1,142 @@
+import os, re, sys, json, hashlib, threading
+from urllib.parse import urlsplit, parse_qs, urlencode
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Vertoapi import VertoClient
+
+PAGE_SIZE = 10
+
+
+#Stand-in for the Verto OData service: serves ENTITIES in pages linked by @odata.nextLink and supports $select, $top,
+#simple $filter expressions (column eq/ge/gt value, joined by and) and If-None-Match
+class ODataHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        entity = parts.path.rsplit('/', 1)[-1]
+        query = {name: values[0] for name, values in parse_qs(parts.query).items()}
+        self.server.requests.append((entity, query))
+        rows = [row for row in self.server.entities[entity] if matches(row, query.get('$filter'))]
+        if '$top' in query:
+            rows = rows[:int(query['$top'])]
+        if '$select' in query:
+            rows = [{column: row.get(column) for column in query['$select'].split(',')} for row in rows]
+        etag = '"' + hashlib.md5(json.dumps(rows, sort_keys=True).encode()).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        skip = int(query.pop('$skiptoken', 0))
+        page = {'@odata.context': f'$metadata#{entity}', 'value': rows[skip:skip + PAGE_SIZE]}
+        if skip + PAGE_SIZE < len(rows):
+            page['@odata.nextLink'] = f"{entity}?{urlencode(dict(query, **{'$skiptoken': skip + PAGE_SIZE}))}"
+        body = json.dumps(page).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def matches(row, filter):
+    for condition in re.split(r'\s+and\s+', (filter or '').replace('(', '').replace(')', '')):
+        if not condition:
+            continue
+        column, operator, value = condition.split(' ', 2)
+        value = value.strip("'")
+        if not {'eq': row[column] == value, 'ge': row[column] >= value, 'gt': row[column] > value}[operator]:
+            return False
+    return True
+
+
+def rows(n, prefix='P'):
+    return [{'ID': f'{prefix}{idx:03d}', 'Name': f'Name {idx % 3}', 'Modified': '2000-01-01T00:00:00Z'} for idx in range(n)]
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ODataHandler)
+    server.entities = {'Project': rows(25), 'Organisation': rows(7, 'O'), 'Portfolio': rows(31, 'F')}
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server, tmp_path):
+    with VertoClient(f'http://127.0.0.1:{server.server_address[1]}/api/', auth=None, cache_dir=str(tmp_path / 'cache')) as client:
+        yield client
+
+
+def test_query_options_reach_server(server, client):
+    _, df = client.get_entity('Project', select=['ID', 'Name'], filter="Name eq 'Name 1'", top=5)
+    entity, query = server.requests[0]
+    assert entity == 'Project'
+    assert query == {'$select': 'ID,Name', '$filter': "Name eq 'Name 1'", '$top': '5'}
+    assert list(df.columns) == ['ID', 'Name']
+    assert len(df) == 5 and (df['Name'] == 'Name 1').all()
+
+
+def test_paging_follows_next_links_until_last_page(server, client):
+    context, df = client.get_entity('Project')
+    assert context == '$metadata#Project'
+    assert len(server.requests) == 3
+    assert df['ID'].tolist() == [row['ID'] for row in server.entities['Project']]
+
+
+def test_paging_stops_at_top(server, client):
+    _, df = client.get_entity('Portfolio', top=12)
+    assert len(server.requests) == 2
+    assert len(df) == 12
+
+
+def test_get_entities_returns_every_entity(server, client):
+    entities = client.get_entities({'Project': {}, 'Organisation': {'select': ['ID']}, 'Portfolio': {}}, max_workers=3)
+    assert {entity: len(df) for entity, (_, df) in entities.items()} == {'Project': 25, 'Organisation': 7, 'Portfolio': 31}
+    assert list(entities['Organisation'][1].columns) == ['ID']
+
+
+def test_sync_reuses_cache_when_not_modified(server, client):
+    _, first = client.sync_entity('Organisation')
+    _, second = client.sync_entity('Organisation')
+    assert len(server.requests) == 2
+    assert second.equals(first)
+    server.entities['Organisation'][0]['Name'] = 'Renamed'
+    _, third = client.sync_entity('Organisation')
+    assert third.loc[0, 'Name'] == 'Renamed'
+
+
+def test_delta_sync_merges_changed_rows(server, client):
+    client.sync_entity('Project', key='ID', modified='Modified', select=['Name'])
+    #A timestamp far behind the client's clock, still after the cached rows
+    server.entities['Project'][3].update(Name='Changed', Modified='2000-01-02T00:00:00Z')
+    server.entities['Project'].append({'ID': 'P100', 'Name': 'New', 'Modified': '2000-01-03T00:00:00Z'})
+    server.requests.clear()
+    _, df = client.sync_entity('Project', key='ID', modified='Modified', select=['Name'])
+    entity, query = server.requests[0]
+    assert query['$filter'] == 'Modified ge 2000-01-01T00:00:00Z'
+    assert query['$select'] == 'Name,ID,Modified'
+    assert len(df) == 26 and df['ID'].is_unique
+    assert df.set_index('ID').loc['P003', 'Name'] == 'Changed'
+    assert df.set_index('ID').loc['P100', 'Name'] == 'New'
+    server.requests.clear()
+    client.sync_entity('Project', key='ID', modified='Modified', select=['Name'])
+    assert server.requests[0][1]['$filter'] == 'Modified ge 2000-01-03T00:00:00Z'
+
+
+def test_cache_dir_is_only_created_when_syncing(server, client, tmp_path):
+    client.get_entity('Organisation')
+    assert not os.path.exists(tmp_path / 'cache')
+    client.sync_entity('Organisation')
+    assert os.path.exists(tmp_path / 'cache')